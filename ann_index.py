@@ -0,0 +1,394 @@
+"""
+Similarity search over the corpus embedding matrix.
+
+Backends:
+- exact : brute-force cosine similarity against every row
+- hnsw  : HNSW graph (hnswlib)
+- ivf   : inverted file lists over k-means centroids (numpy only)
+
+Build an ANN index once from question_embeddings.npy:
+    python ann_index.py build --backend hnsw
+The server loads it at startup according to config.SEARCH_BACKEND.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+from corpus_embeddings import EmbeddingMatrix, embedding_rows, normalize_rows
+
+
+# =========================
+# HELPERS
+# =========================
+
+def top_k_desc(scores, top_k):
+    """
+    Indices of the top_k highest scores, best first. argpartition is
+    O(n); only the top_k survivors are sorted.
+    """
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, top_k - 1)[:top_k]
+    return part[np.argsort(-scores[part])]
+
+
+def top_k_rows(scores, top_k):
+    """
+    Per-row top_k of a (queries x candidates) score matrix, best first.
+    Returns (column indices, scores), both shaped (queries, top_k).
+    """
+    top_k = min(top_k, scores.shape[1])
+    part = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return (
+        np.take_along_axis(part, order, axis=1),
+        np.take_along_axis(part_scores, order, axis=1)
+    )
+
+
+# =========================
+# EXACT (BRUTE FORCE)
+# =========================
+
+_search_pool = None
+_search_pool_pid = None
+_search_pool_lock = threading.Lock()
+
+
+def search_pool(threads):
+    """
+    Shared thread pool for block scoring. Per process: pool threads do
+    not survive a fork, so a preloaded master's pool is never reused.
+    """
+    global _search_pool, _search_pool_pid
+
+    if _search_pool_pid != os.getpid():
+        with _search_pool_lock:
+            if _search_pool_pid != os.getpid():
+                _search_pool = ThreadPoolExecutor(threads, thread_name_prefix="search")
+                _search_pool_pid = os.getpid()
+    return _search_pool
+
+
+class ExactIndex:
+    """
+    Blocked brute-force search. The corpus is scored in fixed-size blocks
+    (in parallel across SEARCH_THREADS); each block keeps only its
+    per-query top_k and the survivors are merged, so a query never holds
+    more than one block of scores per thread and never sorts the corpus.
+    """
+
+    name = "exact"
+
+    def __init__(self, embeddings, block_size=None, threads=None):
+        # Accepts an EmbeddingMatrix (possibly quantized / memory-mapped)
+        # or a raw array, which is normalized into RAM
+        if not isinstance(embeddings, EmbeddingMatrix):
+            embeddings = EmbeddingMatrix(normalize_rows(embeddings))
+        self.vectors = embeddings
+        self.block_size = block_size or config.SEARCH_BLOCK_SIZE
+        self.threads = threads or config.SEARCH_THREADS
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _block_top_k(self, queries, start, top_k):
+        stop = min(start + self.block_size, len(self.vectors))
+        ids, scores = top_k_rows(self.vectors.block_scores(queries, start, stop), top_k)
+        return ids + start, scores
+
+    def _search(self, queries, top_k):
+        if len(self.vectors) == 0 or top_k <= 0:
+            empty = (len(queries), 0)
+            return np.empty(empty, dtype=np.int64), np.empty(empty, dtype=np.float32)
+
+        starts = range(0, len(self.vectors), self.block_size)
+        if self.threads > 1 and len(starts) > 1:
+            parts = list(search_pool(self.threads).map(
+                lambda start: self._block_top_k(queries, start, top_k), starts
+            ))
+        else:
+            parts = [self._block_top_k(queries, start, top_k) for start in starts]
+
+        ids = np.concatenate([ids for ids, _ in parts], axis=1)
+        scores = np.concatenate([scores for _, scores in parts], axis=1)
+        keep, best_scores = top_k_rows(scores, top_k)
+        return np.take_along_axis(ids, keep, axis=1), best_scores
+
+    def search(self, query_embedding, top_k=5):
+        query = normalize_rows(query_embedding).reshape(1, -1)
+        ids, scores = self._search(query, top_k)
+        return ids[0], scores[0]
+
+    def search_batch(self, query_embeddings, top_k=5):
+        """
+        One matrix-matrix product per corpus block, so memory stays at
+        block_size x num_queries scores per thread.
+        """
+        return self._search(normalize_rows(query_embeddings), top_k)
+
+
+# =========================
+# HNSW (hnswlib)
+# =========================
+
+class HNSWIndex:
+    name = "hnsw"
+
+    def __init__(self, index):
+        self.index = index
+        # Set once: ef is shared state of the index, and searches from
+        # several threads must not change it under each other
+        self.index.set_ef(max(config.HNSW_EF_SEARCH, config.SEARCH_MAX_TOP_K))
+
+    def __len__(self):
+        return self.index.get_current_count()
+
+    @classmethod
+    def build(cls, embeddings, m=None, ef_construction=None):
+        import hnswlib
+
+        vectors = normalize_rows(embeddings)
+        index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        index.init_index(
+            max_elements=len(vectors),
+            M=m or config.HNSW_M,
+            ef_construction=ef_construction or config.HNSW_EF_CONSTRUCTION
+        )
+        index.add_items(vectors, np.arange(len(vectors)))
+        return cls(index)
+
+    @staticmethod
+    def paths(index_dir):
+        return (
+            os.path.join(index_dir, "hnsw.bin"),
+            os.path.join(index_dir, "hnsw.json")
+        )
+
+    def save(self, index_dir):
+        bin_path, meta_path = self.paths(index_dir)
+        self.index.save_index(bin_path)
+        with open(meta_path, "w") as f:
+            json.dump({"dim": self.index.dim, "count": len(self)}, f)
+
+    @classmethod
+    def load(cls, index_dir):
+        import hnswlib
+
+        bin_path, meta_path = cls.paths(index_dir)
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        index = hnswlib.Index(space="ip", dim=meta["dim"])
+        index.load_index(bin_path, max_elements=meta["count"])
+        return cls(index)
+
+    def search(self, query_embedding, top_k=5):
+        query = normalize_rows(query_embedding).reshape(1, -1)
+        # knn_query raises when asked for more neighbours than the index
+        # holds; a top_k above ef is searched with ef = top_k by hnswlib
+        top_k = min(top_k, len(self))
+        labels, distances = self.index.knn_query(query, k=top_k)
+        # "ip" space returns 1 - dot product
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def search_batch(self, query_embeddings, top_k=5):
+        queries = normalize_rows(query_embeddings)
+        top_k = min(top_k, len(self))
+        labels, distances = self.index.knn_query(queries, k=top_k)
+        return labels.astype(np.int64), 1.0 - distances
+
+
+# =========================
+# IVF (INVERTED FILE LISTS)
+# =========================
+
+class IVFIndex:
+    name = "ivf"
+
+    def __init__(self, centroids, list_offsets, ids, vectors):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.ids = ids
+        # Rows grouped by list, so each probe reads one contiguous slice
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def train_centroids(vectors, nlist, iterations=10, sample_size=100_000):
+        """
+        Spherical k-means on a sample of the corpus
+        """
+        rng = np.random.default_rng(42)
+        sample = vectors
+        if len(vectors) > sample_size:
+            sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+        return centroids
+
+    @classmethod
+    def build(cls, embeddings, nlist=None, block_size=65536):
+        vectors = normalize_rows(embeddings)
+        nlist = min(nlist or config.IVF_NLIST, len(vectors))
+        centroids = cls.train_centroids(vectors, nlist)
+
+        assign = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), block_size):
+            block = vectors[start:start + block_size]
+            assign[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+
+        ids = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(centroids, list_offsets, ids, vectors[ids])
+
+    ARRAYS = ("centroids", "list_offsets", "ids", "vectors")
+
+    @staticmethod
+    def paths(index_dir):
+        return {name: os.path.join(index_dir, f"ivf.{name}.npy") for name in IVFIndex.ARRAYS}
+
+    def save(self, index_dir):
+        for name, path in self.paths(index_dir).items():
+            np.save(path, getattr(self, name))
+
+    @classmethod
+    def load(cls, index_dir):
+        """
+        ids and vectors are memory-mapped: workers share them through the
+        page cache instead of each holding a copy
+        """
+        paths = cls.paths(index_dir)
+        if not os.path.exists(paths["vectors"]) and os.path.exists(os.path.join(index_dir, "ivf.npz")):
+            print("⚠️  Loading ivf.npz into RAM (rebuild to memory-map it: python ann_index.py build --backend ivf)")
+            data = np.load(os.path.join(index_dir, "ivf.npz"))
+            return cls(*(data[name] for name in cls.ARRAYS))
+
+        return cls(
+            np.load(paths["centroids"]),
+            np.load(paths["list_offsets"]),
+            np.load(paths["ids"], mmap_mode="r"),
+            np.load(paths["vectors"], mmap_mode="r")
+        )
+
+    def search(self, query_embedding, top_k=5):
+        query = normalize_rows(query_embedding).reshape(-1)
+        nprobe = min(config.IVF_NPROBE, len(self.centroids))
+        probes = top_k_desc(self.centroids @ query, nprobe)
+
+        positions = np.concatenate([
+            np.arange(self.list_offsets[c], self.list_offsets[c + 1])
+            for c in probes
+        ])
+        scores = self.vectors[positions] @ query
+        best = top_k_desc(scores, top_k)
+        return self.ids[positions[best]], scores[best]
+
+    def search_batch(self, query_embeddings, top_k=5):
+        """
+        Rows whose probed lists hold fewer than top_k vectors are padded
+        with id -1 and score -inf
+        """
+        top_k = min(top_k, len(self))
+        ids = np.full((len(query_embeddings), top_k), -1, dtype=np.int64)
+        scores = np.full((len(query_embeddings), top_k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(query_embeddings):
+            found_ids, found_scores = self.search(query, top_k)
+            ids[row, :len(found_ids)] = found_ids
+            scores[row, :len(found_scores)] = found_scores
+        return ids, scores
+
+
+# =========================
+# FACTORY
+# =========================
+
+BACKENDS = {
+    "hnsw": HNSWIndex,
+    "ivf": IVFIndex,
+}
+
+
+def build_index(embeddings, backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend: {backend}")
+    return BACKENDS[backend].build(embeddings)
+
+
+def load_index(embeddings, backend=None, index_dir=None):
+    """
+    Load the configured search backend.
+    Falls back to exact search if the ANN index is missing or unusable.
+    embeddings is the corpus matrix or a function returning it; ANN
+    indexes hold their own vectors, so the function is only called for
+    exact search.
+    """
+    backend = backend or config.SEARCH_BACKEND
+    index_dir = index_dir or config.INDEX_DIR
+    matrix = embeddings if callable(embeddings) else lambda: embeddings
+
+    if backend == "exact":
+        return ExactIndex(matrix())
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown search backend: {backend}")
+
+    try:
+        index = BACKENDS[backend].load(index_dir)
+    except (OSError, ImportError) as e:
+        print(f"⚠️  Could not load {backend} index from {index_dir} ({e}), using exact search")
+        return ExactIndex(matrix())
+
+    rows = embedding_rows() if callable(embeddings) else len(embeddings)
+    if len(index) != rows:
+        print(f"⚠️  {backend} index is stale ({len(index)} vs {rows} rows), using exact search")
+        return ExactIndex(matrix())
+
+    return index
+
+
+# =========================
+# CLI
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the ANN index for corpus search")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build and persist an ANN index")
+    build.add_argument("--backend", choices=sorted(BACKENDS), default="hnsw")
+    build.add_argument("--embeddings", default=config.EMBEDDINGS_PATH)
+    build.add_argument("--index-dir", default=config.INDEX_DIR)
+
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings)
+    os.makedirs(args.index_dir, exist_ok=True)
+
+    print(f"🚀 Building {args.backend} index over {embeddings.shape[0]} vectors...")
+    start = time.perf_counter()
+    index = build_index(embeddings, args.backend)
+    index.save(args.index_dir)
+    print(f"✅ Saved to {args.index_dir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+ASGI version of the API (same routes and payloads as app.py).
+
+The event loop never runs model or SQLite work itself. Handlers await
+one of two bounded thread pools:
+- inference : SBERT encodes, tagging, corpus search
+- db        : SQLite reads and writes
+so /login, /questions/<id> or /user/preferences are served by free db
+threads while encodes queue on the inference pool. Threads (not
+processes) keep a single copy of the models and corpus per worker, and
+concurrent encodes still meet in the micro-batching scheduler.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+    python asgi_app.py
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+
+import config
+import metrics
+import services
+from services import ServiceError
+
+# Database
+from models import init_db_once
+
+# NLP logic
+from model_utils import (
+    embedding_cache,
+    inference_scheduler,
+    readiness,
+    start_warm_up
+)
+
+inference_executor = ThreadPoolExecutor(
+    max_workers=config.INFERENCE_WORKERS, thread_name_prefix="inference"
+)
+db_executor = ThreadPoolExecutor(
+    max_workers=config.DB_WORKERS, thread_name_prefix="db"
+)
+
+# Requests admitted to the inference pool (running or queued)
+inference_slots = asyncio.BoundedSemaphore(config.ASGI_MAX_PENDING_INFERENCE)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    init_db_once()
+    start_warm_up()
+    services.start_background_workers()
+    yield
+    inference_executor.shutdown(wait=False, cancel_futures=True)
+    db_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="NLP-powered Anonymous Q&A", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link"]
+)
+
+
+@app.middleware("http")
+async def record_request(request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe_request(
+            request.method, route.path if route else "unmatched", status,
+            time.perf_counter() - start
+        )
+
+
+# =========================
+# EXECUTORS
+# =========================
+async def run_db(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(fn, *args))
+
+
+async def run_inference(fn, *args):
+    if inference_slots.locked():
+        raise ServiceError("Server busy, try again later", 503)
+
+    async with inference_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(inference_executor, partial(fn, *args))
+
+
+# =========================
+# ERRORS
+# =========================
+@app.exception_handler(ServiceError)
+async def service_error(request, e):
+    return JSONResponse({"error": e.message}, status_code=e.status)
+
+
+def paginated_response(request, items, next_cursor):
+    base_url = str(request.url.replace(query=""))
+    return JSONResponse(
+        items,
+        headers=services.next_page_headers(base_url, len(items), next_cursor)
+    )
+
+
+async def json_body(request):
+    """
+    Parsed request body; malformed or empty JSON is a 400, as in Flask
+    """
+    try:
+        return await request.json()
+    except ValueError:
+        raise ServiceError("Invalid JSON body", 400)
+
+
+def page_params(request):
+    return services.page_params(
+        request.query_params.get("limit"), request.query_params.get("cursor")
+    )
+
+
+# =========================
+# AUTH
+# =========================
+@app.post("/signup")
+async def signup(request: Request):
+    return await run_db(services.signup, await json_body(request))
+
+
+@app.post("/login")
+async def login(request: Request):
+    return await run_db(services.login, await json_body(request))
+
+
+# =========================
+# HEALTH CHECK
+# =========================
+@app.get("/")
+async def home():
+    return {"message": "NLP-powered Anonymous Q&A Backend is running"}
+
+
+@app.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+# =========================
+# CACHE STATS
+# =========================
+@app.get("/stats")
+async def stats():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "inference_scheduler": inference_scheduler.stats(),
+        "response_cache": services.response_cache.stats(),
+        "enrichment": await run_db(services.enrichment_pool.stats)
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# =========================
+# ANALYZE / SEARCH QUESTION
+# =========================
+@app.post("/analyze-question")
+async def analyze(request: Request):
+    return await run_inference(services.analyze, await json_body(request))
+
+
+@app.post("/analyze-questions")
+async def analyze_batch(request: Request):
+    return await run_inference(services.analyze_batch, await json_body(request))
+
+
+# =========================
+# ASK QUESTION
+# =========================
+@app.post("/ask-question")
+async def ask_question(request: Request):
+    data = await json_body(request)
+    if config.ASK_MODE == "async":
+        # A single INSERT; the NLP runs in the enrichment workers
+        result = await run_db(services.accept_question, data)
+        return JSONResponse(result, status_code=202)
+
+    question_text, nlp_result = await run_inference(services.prepare_question, data)
+    return await run_db(services.store_question, question_text, data.get("user_id"), nlp_result)
+
+
+# =========================
+# FEEDS
+# =========================
+@app.get("/questions")
+async def get_questions(request: Request):
+    limit, after = page_params(request)
+    questions, next_cursor = await run_db(services.feed_page, limit, after)
+    return paginated_response(request, questions, next_cursor)
+
+
+@app.get("/questions/filtered/{user_id}")
+async def get_filtered_questions(user_id: int, request: Request):
+    limit, after = page_params(request)
+    questions, next_cursor = await run_db(services.filtered_feed_page, user_id, limit, after)
+    return paginated_response(request, questions, next_cursor)
+
+
+@app.get("/clusters/{cluster_id}/questions")
+async def get_cluster_questions(cluster_id: int, request: Request):
+    limit, after = page_params(request)
+    questions, next_cursor = await run_db(services.cluster_page, cluster_id, limit, after)
+    return paginated_response(request, questions, next_cursor)
+
+
+# =========================
+# ANSWERS / QUESTION DETAIL
+# =========================
+@app.post("/answer-question")
+async def answer_question(request: Request):
+    return await run_db(services.answer_question, await json_body(request))
+
+
+@app.get("/questions/similar/{question_id}")
+async def get_similar_questions(question_id: int):
+    # May encode rows stored before embeddings were persisted
+    return await run_inference(services.similar_questions, question_id)
+
+
+@app.get("/questions/{question_id}/status")
+async def get_question_status(question_id: int):
+    return await run_db(services.question_status, question_id)
+
+
+@app.get("/questions/{question_id}")
+async def get_question_detail(question_id: int):
+    return await run_db(services.question_detail, question_id)
+
+
+# =========================
+# USER PREFERENCES
+# =========================
+@app.post("/user/preferences")
+async def save_user_preferences(request: Request):
+    return await run_db(services.save_preferences, await json_body(request))
+
+
+@app.get("/user/preferences/{user_id}")
+async def get_user_preferences(user_id: int):
+    return await run_db(services.get_preferences, user_id)
+
+
+# =========================
+# RUN SERVER
+# =========================
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
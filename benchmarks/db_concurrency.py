@@ -0,0 +1,154 @@
+"""
+SQLite concurrency benchmark: the original connection-per-call setup
+(default rollback journal) vs the pooled, WAL-tuned database.get_db.
+
+Writers mimic /ask-question + /answer-question, readers mimic the feed
+and question detail routes. Each mode runs against a fresh database file.
+
+    python -m benchmarks.db_concurrency --writers 4 --readers 8 --seconds 10
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import database
+from models import init_db
+
+
+def baseline_connect(path):
+    """
+    What database.get_db did before pooling
+    """
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def write_op(conn, rng):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO questions (question_text, auto_tags, rank_score, user_id)
+        VALUES (?, ?, ?, ?)
+    """, ("benchmark question", "python,sql", rng.random(), 1))
+    question_id = cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO answers (question_id, answer_text, user_id)
+        VALUES (?, ?, ?)
+    """, (question_id, "benchmark answer", 2))
+    conn.commit()
+
+
+def read_op(conn, rng):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, question_text, auto_tags, feed_score
+        FROM questions
+        ORDER BY feed_score DESC, id DESC
+        LIMIT 20
+    """)
+    rows = cursor.fetchall()
+    if rows:
+        cursor.execute("""
+            SELECT answer_text, created_at, user_id
+            FROM answers WHERE question_id = ?
+        """, (rng.choice(rows)["id"],))
+        cursor.fetchall()
+
+
+def run_mode(mode, writers, readers, seconds, seed_rows):
+    path = os.path.join(tempfile.mkdtemp(), f"{mode}.db")
+    init_db(path)
+
+    if mode == "baseline":
+        database.get_pool(path).close_all()
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+        connect = lambda: baseline_connect(path)
+    else:
+        connect = lambda: database.get_db(path)
+
+    seed = connect()
+    rng = random.Random(0)
+    for _ in range(seed_rows):
+        write_op(seed, rng)
+    seed.close()
+
+    results = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind, op, worker_seed):
+        rng = random.Random(worker_seed)
+        latencies = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            conn = connect()
+            try:
+                op(conn, rng)
+                latencies.append(time.perf_counter() - start)
+            except sqlite3.OperationalError:
+                # "database is locked"
+                failed += 1
+            finally:
+                conn.close()
+        with lock:
+            results[kind].extend(latencies)
+            errors[kind] += failed
+
+    threads = (
+        [threading.Thread(target=worker, args=("write", write_op, i)) for i in range(writers)] +
+        [threading.Thread(target=worker, args=("read", read_op, 1000 + i)) for i in range(readers)]
+    )
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    def summary(kind):
+        latencies = np.array(results[kind]) * 1000
+        return {
+            "ops": len(latencies),
+            "ops_per_sec": round(len(latencies) / seconds, 1),
+            "errors": errors[kind],
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+        }
+
+    return {"write": summary("write"), "read": summary("read")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite read/write concurrency benchmark")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed-rows", type=int, default=2000)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    report = {
+        "config": vars(args),
+        "baseline": run_mode("baseline", args.writers, args.readers, args.seconds, args.seed_rows),
+        "pooled_wal": run_mode("pooled", args.writers, args.readers, args.seconds, args.seed_rows),
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
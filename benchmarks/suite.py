@@ -0,0 +1,362 @@
+"""
+Latency, throughput and memory of the model layer and the HTTP routes on
+synthetic corpora. Runs offline with the stand-in encoder (see
+benchmarks/synthetic.py); corpora are generated once and reused.
+
+    python -m benchmarks.suite run --sizes 10000 100000 --label before
+    python -m benchmarks.suite run --sizes 10000 100000 1000000 --label after
+    python -m benchmarks.suite compare benchmarks/results/before.json benchmarks/results/after.json
+
+Each corpus size runs in a fresh process, so peak memory is per size.
+Results go to benchmarks/results/<label>.json.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SEED_QUESTIONS = 2000
+
+
+# =========================
+# MEASUREMENT
+# =========================
+
+def peak_rss_mb():
+    import resource
+
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def measure(fn, iterations, warmup):
+    """
+    fn(i) is called warmup + iterations times with a distinct i (so inputs
+    do not hit the embedding cache). Latency is timed on its own; peak
+    allocation comes from a separate tracemalloc pass.
+    """
+    for i in range(warmup):
+        fn(i)
+
+    latencies = []
+    for i in range(warmup, warmup + iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for i in range(warmup + iterations, warmup + iterations + 3):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = np.array(latencies) * 1000
+    return {
+        "iterations": iterations,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "ops_per_sec": round(len(ms) / (ms.sum() / 1000), 1),
+        "peak_alloc_mb": round(peak / 1e6, 3),
+    }
+
+
+# =========================
+# ONE CORPUS SIZE (CHILD PROCESS)
+# =========================
+
+def load_synthetic(rows, data_dir):
+    """
+    Install the synthetic corpus and stand-in models
+    """
+    import model_utils
+    from ann_index import load_index
+    from corpus_embeddings import load_embeddings
+    from corpus_store import load_corpus
+    from tag_engine import VocabTagEngine
+
+    from benchmarks import synthetic
+
+    encoder = synthetic.StandInEncoder()
+    p = synthetic.paths(data_dir)
+
+    start = time.perf_counter()
+    embeddings = load_embeddings("float32", mmap=False, embeddings_path=p["embeddings_path"])
+    components = {
+        "corpus": load_corpus(store_dir=p["corpus_dir"]),
+        "embeddings": embeddings,
+        "corpus_index": load_index(embeddings, backend="exact"),
+        "sbert_model": encoder,
+        "tag_engine": VocabTagEngine.load(p["tag_dir"]),
+    }
+
+    backend = synthetic.keybert_backend(encoder)
+    if backend is not None:
+        from keybert import KeyBERT
+        components["kw_model"] = KeyBERT(model=backend)
+
+    model_utils.use_components(**components)
+    return encoder, round(time.perf_counter() - start, 3), backend is not None
+
+
+def seed_database(encoder, rng):
+    """
+    Questions, answers, a user and tag preferences for the route benchmarks
+    """
+    from database import get_db
+    from models import init_db, set_question_tags
+    from question_embeddings import to_blob
+
+    from benchmarks.synthetic import random_questions
+
+    init_db()
+    texts, row_tags = random_questions(rng, SEED_QUESTIONS)
+    embeddings = encoder.encode(texts)
+
+    db = get_db()
+    cursor = db.cursor()
+    for text, tags, embedding in zip(texts, row_tags, embeddings):
+        cursor.execute("""
+            INSERT INTO questions (question_text, auto_tags, rank_score, user_id, embedding)
+            VALUES (?, ?, ?, ?, ?)
+        """, (text, ",".join(tags), float(rng.random()), 1, to_blob(embedding)))
+        question_id = cursor.lastrowid
+        set_question_tags(cursor, question_id, tags)
+        for _ in range(int(rng.integers(0, 4))):
+            cursor.execute("""
+                INSERT INTO answers (question_id, answer_text, user_id) VALUES (?, ?, ?)
+            """, (question_id, "synthetic answer", 1))
+    db.commit()
+    db.close()
+
+
+def function_targets(has_keybert):
+    """
+    {name: fn(queries, i)}; every target gets its own query list
+    """
+    import model_utils
+
+    def embedding(text):
+        return model_utils.get_sbert_model().encode(text)
+
+    targets = {
+        "encode_query": lambda q, i: model_utils.encode_query(q[i]),
+        "corpus_search": lambda q, i: model_utils.get_corpus_index().search(embedding(q[i]), 5),
+        "extract_keywords_improved[vocab]": lambda q, i: model_utils.extract_keywords_improved(
+            q[i], embedding=embedding(q[i]), engine="vocab"
+        ),
+        "analyze_question": lambda q, i: model_utils.analyze_question(q[i]),
+        "process_new_question": lambda q, i: model_utils.process_new_question(q[i]),
+        "analyze_questions[32]": lambda q, i: model_utils.analyze_questions(
+            [f"{q[i]} {j}" for j in range(32)]
+        ),
+    }
+    if has_keybert:
+        targets["extract_keywords_improved[keybert]"] = lambda q, i: model_utils.extract_keywords_improved(
+            q[i], engine="keybert"
+        )
+    return targets
+
+
+def endpoint_targets(client):
+    ids = list(range(1, SEED_QUESTIONS + 1))
+
+    def ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    return {
+        "POST /analyze-question": lambda q, i: ok(client.post(
+            "/analyze-question", json={"question": q[i]}
+        )),
+        "POST /ask-question": lambda q, i: ok(client.post(
+            "/ask-question", json={"question": q[i], "user_id": 1}
+        )),
+        "GET /questions": lambda q, i: ok(client.get("/questions")),
+        "GET /questions/<id>": lambda q, i: ok(client.get(f"/questions/{random.choice(ids)}")),
+        "GET /questions/similar/<id>": lambda q, i: ok(client.get(
+            f"/questions/similar/{random.choice(ids)}"
+        )),
+        "GET /questions/filtered/<user_id>": lambda q, i: ok(client.get("/questions/filtered/1")),
+        "POST /login": lambda q, i: ok(client.post(
+            "/login", json={"email": "bench@example.com", "password": "bench"}
+        )),
+    }
+
+
+def run_size(rows, data_dir, iterations, warmup):
+    """
+    Benchmark one corpus size; runs in its own process
+    """
+    random.seed(0)
+    rng = np.random.default_rng(0)
+
+    os.chdir(tempfile.mkdtemp(prefix="qa_bench_db_"))
+    encoder, load_s, has_keybert = load_synthetic(rows, data_dir)
+    rss_after_load = peak_rss_mb()
+
+    from benchmarks.synthetic import random_questions
+
+    def fresh_queries():
+        queries, _ = random_questions(rng, warmup + iterations + 3)
+        return queries
+
+    seed_database(encoder, rng)
+
+    import app
+    client = app.app.test_client()
+    client.post("/signup", json={"email": "bench@example.com", "password": "bench"})
+    client.post("/user/preferences", json={"user_id": 1, "tags": ["python", "sql"]})
+
+    report = {
+        "rows": rows,
+        "load_s": load_s,
+        "rss_after_load_mb": rss_after_load,
+        "functions": {},
+        "endpoints": {},
+    }
+
+    for section, targets in (
+        ("functions", function_targets(has_keybert)),
+        ("endpoints", endpoint_targets(client)),
+    ):
+        for name, fn in targets.items():
+            print(f"  ✓ {rows} rows · {name}")
+            queries = fresh_queries()
+            report[section][name] = measure(lambda i: fn(queries, i), iterations, warmup)
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+# =========================
+# RUN / COMPARE
+# =========================
+
+def metadata():
+    import config
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "encoder": "stand-in (benchmarks.synthetic.StandInEncoder)",
+        "search_backend": "exact",
+        "microbatch": config.MICROBATCH_ENABLED,
+        "response_cache": config.RESPONSE_CACHE_ENABLED,
+    }
+
+
+def run(sizes, iterations, warmup, data_dir, label, response_cache=False):
+    # Settings for the child processes, read by config at import
+    os.environ["QA_WARMUP_MODE"] = "lazy"
+    os.environ["QA_ASK_MODE"] = "sync"
+    os.environ["QA_TAG_ENGINE"] = "vocab"
+    os.environ["QA_RESPONSE_CACHE"] = "1" if response_cache else "0"
+
+    report = {"meta": metadata(), "sizes": {}}
+    report["meta"].update({"iterations": iterations, "warmup": warmup})
+
+    from benchmarks import synthetic
+
+    for rows in sizes:
+        size_dir = os.path.join(data_dir, str(rows))
+        # Generated here so its memory does not count towards the size's peak
+        if not synthetic.exists(size_dir, rows):
+            synthetic.generate(rows, size_dir)
+
+        print(f"🚀 Benchmarking {rows} rows")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            report["sizes"][str(rows)] = pool.submit(
+                run_size, rows, size_dir, iterations, warmup
+            ).result()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label or report['meta']['commit'] or 'results'}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {path}")
+    return report
+
+
+def compare(before_path, after_path):
+    """
+    Print p50 / p95 / peak allocation changes between two result files
+    """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"{'size':>8}  {'target':<40} {'p50 ms':>20} {'p95 ms':>20} {'alloc':>8}")
+    for size, new_size in after["sizes"].items():
+        old_size = before["sizes"].get(size)
+        if old_size is None:
+            continue
+        for section in ("functions", "endpoints"):
+            for name, new in new_size[section].items():
+                old = old_size[section].get(name)
+                if old is None:
+                    continue
+                print(
+                    f"{size:>8}  {name:<40} "
+                    f"{old['p50_ms']:>8} → {new['p50_ms']:<9} "
+                    f"{old['p95_ms']:>8} → {new['p95_ms']:<9} "
+                    f"{change(old['peak_alloc_mb'], new['peak_alloc_mb']):>8}  "
+                    f"p50 {change(old['p50_ms'], new['p50_ms'])}"
+                )
+        print(f"{size:>8}  {'peak RSS (MB)':<40} {old_size['peak_rss_mb']:>8} → {new_size['peak_rss_mb']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model layer and route benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Benchmark synthetic corpora of the given sizes")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    run_parser.add_argument("--iterations", type=int, default=200)
+    run_parser.add_argument("--warmup", type=int, default=10)
+    run_parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "qa_bench"))
+    run_parser.add_argument("--label", default=None, help="Result file name (default: git commit)")
+    run_parser.add_argument("--response-cache", action="store_true",
+                            help="Keep the response cache on (off by default to time the work)")
+
+    compare_parser = sub.add_parser("compare", help="Diff two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args.sizes, args.iterations, args.warmup, args.data_dir, args.label,
+            response_cache=args.response_cache)
+    else:
+        compare(args.before, args.after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Synthetic corpora and a stand-in encoder, so benchmarks run offline and
+without the D:/ data files.
+
+A corpus of N rows is written in the layout the server reads:
+
+    <out>/corpus/                               packed served columns (corpus_store)
+    <out>/embeddings/question_embeddings.npy    float32, one row per question
+    <out>/tags/                                 vocab tag engine (tag_engine)
+
+Texts are drawn from per-tag topic words, so similar questions share
+tags and the search and tagging stages do representative work.
+
+    python -m benchmarks.synthetic --rows 100000 --out /tmp/qa_bench_100k
+"""
+
+import argparse
+import os
+import time
+import zlib
+
+import numpy as np
+
+TOPICS = {
+    "python": ["python", "list", "dict", "pandas", "numpy", "django", "flask", "import"],
+    "javascript": ["javascript", "react", "node", "promise", "async", "npm", "dom", "json"],
+    "java": ["java", "spring", "maven", "jvm", "hibernate", "stream", "interface", "gradle"],
+    "c#": ["csharp", "linq", "dotnet", "entity", "async", "wpf", "nuget", "task"],
+    "sql": ["sql", "query", "join", "index", "mysql", "postgresql", "table", "select"],
+    "html": ["html", "css", "layout", "flexbox", "div", "browser", "style", "form"],
+    "docker": ["docker", "container", "image", "compose", "kubernetes", "volume", "port", "build"],
+    "git": ["git", "branch", "merge", "rebase", "commit", "remote", "stash", "conflict"],
+    "machine-learning": ["model", "training", "tensorflow", "pytorch", "feature", "sklearn", "loss", "layer"],
+    "linux": ["linux", "bash", "shell", "permission", "process", "kernel", "cron", "ssh"],
+    "android": ["android", "activity", "gradle", "kotlin", "intent", "layout", "emulator", "view"],
+    "regex": ["regex", "pattern", "match", "group", "replace", "capture", "escape", "string"],
+}
+
+FILLER = [
+    "how", "to", "error", "when", "using", "fix", "not", "working", "get",
+    "value", "from", "convert", "return", "function", "file", "data", "best",
+    "way", "issue", "with", "in", "after", "update", "why", "does",
+]
+
+
+# =========================
+# STAND-IN ENCODER
+# =========================
+
+class StandInEncoder:
+    """
+    Deterministic bag-of-words encoder with the SentenceTransformer.encode
+    signature. Each word maps to a fixed pseudo-random vector (seeded by
+    its hash); a sentence is the normalized sum of its word vectors.
+    """
+
+    def __init__(self, dim=384, seed=0):
+        self.dim = dim
+        self.seed = seed
+        self._ids = {}
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _word_ids(self, words):
+        new = [w for w in dict.fromkeys(words) if w not in self._ids]
+        if new:
+            vectors = np.stack([
+                np.random.default_rng(zlib.crc32(w.encode()) ^ self.seed)
+                .standard_normal(self.dim).astype(np.float32)
+                for w in new
+            ])
+            for w in new:
+                self._ids[w] = len(self._ids)
+            self._vectors = np.concatenate([self._vectors, vectors])
+        return [self._ids[w] for w in words]
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        out = np.empty((len(sentences), self.dim), dtype=np.float32)
+        for start in range(0, len(sentences), batch_size):
+            tokens = [s.lower().split() or [""] for s in sentences[start:start + batch_size]]
+            lengths = np.array([len(t) for t in tokens])
+            ids = np.array(self._word_ids([w for t in tokens for w in t]), dtype=np.int64)
+
+            # Sum word vectors per sentence: one gather and one segmented reduction
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            out[start:start + len(tokens)] = np.add.reduceat(self._vectors[ids], offsets, axis=0)
+
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+
+def keybert_backend(encoder):
+    """
+    The stand-in encoder as a KeyBERT embedding backend (None without keybert)
+    """
+    try:
+        from keybert.backend import BaseEmbedder
+    except ImportError:
+        return None
+
+    class StandInBackend(BaseEmbedder):
+        def embed(self, documents, verbose=False):
+            return encoder.encode(list(documents))
+
+    return StandInBackend()
+
+
+# =========================
+# CORPUS
+# =========================
+
+def random_questions(rng, n):
+    """
+    (texts, tag lists) for n synthetic questions: 1-3 tags, three topic
+    words per tag and 4-9 filler words, shuffled
+    """
+    tags = list(TOPICS)
+    words = [w for t in tags for w in TOPICS[t]] + FILLER
+    topic_size = len(TOPICS[tags[0]])
+    filler_start = len(tags) * topic_size
+
+    # Random permutations per row via argsort of random keys
+    chosen = np.argsort(rng.random((n, len(tags))), axis=1)[:, :3]
+    num_tags = rng.integers(1, 4, n)
+    picks = np.argsort(rng.random((n, 3, topic_size)), axis=2)[:, :, :3]
+    topic_ids = (chosen[:, :, None] * topic_size + picks).reshape(n, 9)
+    topic_ids[np.repeat(np.arange(3), 3)[None, :] >= num_tags[:, None]] = -1
+
+    filler_ids = filler_start + rng.integers(0, len(FILLER), (n, 9))
+    filler_ids[np.arange(9)[None, :] >= rng.integers(4, 10, n)[:, None]] = -1
+
+    ids = np.concatenate([topic_ids, filler_ids], axis=1)
+    keys = np.where(ids >= 0, rng.random(ids.shape), np.inf)
+    ids = np.take_along_axis(ids, np.argsort(keys, axis=1), axis=1)
+
+    texts = [" ".join(words[i] for i in row if i >= 0) for row in ids.tolist()]
+    row_tags = [[tags[t] for t in row[:k]] for row, k in zip(chosen.tolist(), num_tags.tolist())]
+    return texts, row_tags
+
+
+def tags_list(tags):
+    """
+    Tags in the ranked CSV's Tags_List format: ['python' 'pandas']
+    """
+    return "[" + " ".join(f"'{t}'" for t in tags) + "]"
+
+
+def paths(out_dir):
+    return {
+        "corpus_dir": os.path.join(out_dir, "corpus"),
+        "embeddings_path": os.path.join(out_dir, "embeddings", "question_embeddings.npy"),
+        "tag_dir": os.path.join(out_dir, "tags"),
+    }
+
+
+def exists(out_dir, rows):
+    from corpus_store import PackedCorpus
+
+    p = paths(out_dir)
+    if not (PackedCorpus.exists(p["corpus_dir"]) and os.path.exists(p["embeddings_path"])):
+        return False
+    return len(PackedCorpus(p["corpus_dir"])) == rows
+
+
+def generate(rows, out_dir, encoder=None, seed=42, chunksize=100_000):
+    """
+    Write a synthetic corpus of rows questions to out_dir (see module doc)
+    """
+    import pandas as pd
+
+    from corpus_store import write_store
+    from tag_engine import VocabTagEngine
+
+    encoder = encoder or StandInEncoder()
+    rng = np.random.default_rng(seed)
+    p = paths(out_dir)
+    os.makedirs(os.path.dirname(p["embeddings_path"]), exist_ok=True)
+
+    print(f"🚀 Generating {rows} synthetic questions in {out_dir}")
+    start = time.perf_counter()
+
+    embeddings = np.lib.format.open_memmap(
+        p["embeddings_path"], mode="w+", dtype=np.float32, shape=(rows, encoder.dim)
+    )
+
+    def chunks():
+        for chunk_start in range(0, rows, chunksize):
+            n = min(chunksize, rows - chunk_start)
+            texts, row_tags = random_questions(rng, n)
+            embeddings[chunk_start:chunk_start + n] = encoder.encode(texts, batch_size=4096)
+            yield pd.DataFrame({
+                "Processed_Text": texts,
+                "final_rank_score": rng.random(n).astype(np.float32),
+                "Tags_List": [tags_list(t) for t in row_tags],
+            })
+
+    write_store(chunks(), p["corpus_dir"])
+    embeddings.flush()
+    del embeddings
+
+    vocab = sorted(TOPICS)
+    VocabTagEngine(vocab, encoder.encode(vocab)).save(p["tag_dir"])
+
+    print(f"✅ Generated in {time.perf_counter() - start:.1f}s")
+    return p
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.rows, args.out, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Question clusters (see notebooks/question_clustering.ipynb).
+
+The notebook fit KMeans(n_clusters=30) on the whole embedding matrix in
+RAM. Here MiniBatchKMeans is fit with partial_fit over blocks read from
+the memory-mapped matrix, so the corpus never has to fit in memory, and
+only the centroids are kept:
+
+    <cluster dir>/centroids.npy    float32 (clusters x dim)
+    <cluster dir>/labels.npy       cluster of every corpus row
+
+A new question is assigned online from its SBERT embedding with one
+product against the centroids (nearest centroid, as KMeans.predict), and
+the label is stored in questions.cluster_id for /clusters/<id>/questions.
+
+    python clustering.py fit --clusters 30
+    python clustering.py assign-db      # label questions already in the database
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import config
+from corpus_embeddings import normalize_rows
+
+
+# =========================
+# MODEL
+# =========================
+
+class ClusterModel:
+    """
+    Nearest-centroid assignment for normalized embeddings
+    """
+
+    def __init__(self, centroids):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        # argmin |x - c|^2 == argmax (x . c - |c|^2 / 2)
+        self.bias = -0.5 * np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    def __len__(self):
+        return len(self.centroids)
+
+    @staticmethod
+    def paths(cluster_dir=None):
+        cluster_dir = cluster_dir or config.CLUSTER_DIR
+        return (
+            os.path.join(cluster_dir, "centroids.npy"),
+            os.path.join(cluster_dir, "labels.npy")
+        )
+
+    @staticmethod
+    def exists(cluster_dir=None):
+        return os.path.exists(ClusterModel.paths(cluster_dir)[0])
+
+    @classmethod
+    def load(cls, cluster_dir=None):
+        return cls(np.load(cls.paths(cluster_dir)[0]))
+
+    def save(self, cluster_dir=None):
+        centroids_path, _ = self.paths(cluster_dir)
+        os.makedirs(os.path.dirname(centroids_path), exist_ok=True)
+        np.save(centroids_path, self.centroids)
+
+    def assign_batch(self, embeddings):
+        scores = normalize_rows(np.atleast_2d(embeddings)) @ self.centroids.T + self.bias
+        return np.argmax(scores, axis=1)
+
+    def assign(self, embedding):
+        return int(self.assign_batch(embedding)[0])
+
+
+# =========================
+# FIT
+# =========================
+
+def fit(n_clusters=None, embeddings_path=None, cluster_dir=None, batch_size=4096, epochs=3, seed=42):
+    """
+    Mini-batch k-means over the memory-mapped corpus matrix. Each epoch
+    visits the blocks in a new random order (rows are stored by date, not
+    at random), then every row is labelled in one streaming pass.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    n_clusters = n_clusters or config.NUM_CLUSTERS
+    embeddings_path = embeddings_path or config.EMBEDDINGS_PATH
+    vectors = np.load(embeddings_path, mmap_mode="r")
+    rows = len(vectors)
+    batch_size = max(batch_size, n_clusters)
+
+    print(f"🚀 Fitting {n_clusters} clusters over {rows} embeddings ({epochs} epochs)")
+    start = time.perf_counter()
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=seed, n_init=3)
+    rng = np.random.default_rng(seed)
+    starts = np.arange(0, rows, batch_size)
+    for epoch in range(epochs):
+        for block_start in rng.permutation(starts):
+            block = normalize_rows(vectors[block_start:block_start + batch_size])
+            if len(block) >= n_clusters:
+                kmeans.partial_fit(block)
+        print(f"  ✓ epoch {epoch + 1}/{epochs}, inertia {kmeans.inertia_:.1f}")
+
+    model = ClusterModel(kmeans.cluster_centers_)
+    model.save(cluster_dir)
+
+    labels = np.empty(rows, dtype=np.int32)
+    for block_start in range(0, rows, batch_size):
+        labels[block_start:block_start + batch_size] = model.assign_batch(
+            vectors[block_start:block_start + batch_size]
+        )
+    np.save(model.paths(cluster_dir)[1], labels)
+
+    sizes = np.bincount(labels, minlength=n_clusters)
+    print(f"✅ Saved to {cluster_dir or config.CLUSTER_DIR} in {time.perf_counter() - start:.1f}s "
+          f"(cluster sizes {sizes.min()}-{sizes.max()})")
+    return model
+
+
+# =========================
+# DATABASE
+# =========================
+
+def assign_db(cluster_dir=None, batch_size=1024):
+    """
+    Set cluster_id for stored questions that have an embedding but no cluster
+    """
+    from database import get_db
+    from models import init_db
+    from question_embeddings import from_blob
+
+    init_db()
+    model = ClusterModel.load(cluster_dir)
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT id, embedding
+        FROM questions
+        WHERE cluster_id IS NULL AND embedding IS NOT NULL
+        ORDER BY id
+    """)
+    rows = cursor.fetchall()
+
+    print(f"🚀 Assigning clusters to {len(rows)} questions...")
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        labels = model.assign_batch(np.stack([from_blob(row["embedding"]) for row in batch]))
+        cursor.executemany("""
+            UPDATE questions SET cluster_id = ? WHERE id = ?
+        """, [(int(label), row["id"]) for row, label in zip(batch, labels)])
+        db.commit()
+
+    db.close()
+    print("✅ Cluster assignment complete")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Question clusters")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fit_cmd = sub.add_parser("fit", help="Fit cluster centroids on the corpus embeddings")
+    fit_cmd.add_argument("--clusters", type=int, default=config.NUM_CLUSTERS)
+    fit_cmd.add_argument("--embeddings", default=config.EMBEDDINGS_PATH)
+    fit_cmd.add_argument("--out", default=config.CLUSTER_DIR)
+    fit_cmd.add_argument("--batch-size", type=int, default=4096)
+    fit_cmd.add_argument("--epochs", type=int, default=3)
+
+    assign_cmd = sub.add_parser("assign-db", help="Label stored questions without a cluster")
+    assign_cmd.add_argument("--out", default=config.CLUSTER_DIR)
+
+    args = parser.parse_args()
+    if args.command == "fit":
+        fit(args.clusters, args.embeddings, args.out, batch_size=args.batch_size, epochs=args.epochs)
+    else:
+        assign_db(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import os
+
+# =========================
+# DATA PATHS
+# =========================
+
+DATA_DIR = os.environ.get("QA_DATA_DIR", "D:/Projects/nlp_qa_platform/data")
+
+RANKED_DATASET_PATH = os.path.join(
+    DATA_DIR, "processed", "final_dataset_ranked.csv"
+)
+EMBEDDINGS_PATH = os.path.join(
+    DATA_DIR, "embeddings", "question_embeddings.npy"
+)
+# Packed served columns, built with: python corpus_store.py build
+CORPUS_DIR = os.environ.get("QA_CORPUS_DIR", os.path.join(DATA_DIR, "corpus"))
+INDEX_DIR = os.environ.get("QA_INDEX_DIR", os.path.join(DATA_DIR, "index"))
+
+# =========================
+# MODELS
+# =========================
+
+SBERT_MODEL_NAME = os.environ.get("QA_SBERT_MODEL", "all-MiniLM-L6-v2")
+ENCODE_BATCH_SIZE = int(os.environ.get("QA_ENCODE_BATCH_SIZE", 32))
+
+# Micro-batching of concurrent single-question encodes
+MICROBATCH_ENABLED = os.environ.get("QA_MICROBATCH", "1") == "1"
+MICROBATCH_MAX_SIZE = int(os.environ.get("QA_MICROBATCH_MAX_SIZE", 32))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("QA_MICROBATCH_MAX_WAIT_MS", 5))
+
+# "background" (default) loads data and models in a thread at startup,
+# "eager" blocks startup until warm, "lazy" loads on first use.
+# /health/ready reports when everything is loaded.
+WARMUP_MODE = os.environ.get("QA_WARMUP_MODE", "background")
+
+# =========================
+# CORPUS EMBEDDING STORAGE
+# =========================
+
+# "float32", "float16" or "int8" (per-row scales). Non-float32 modes and
+# mmap read a packed file written by: python corpus_embeddings.py pack
+EMBEDDING_DTYPE = os.environ.get("QA_EMBEDDING_DTYPE", "float32")
+EMBEDDING_MMAP = os.environ.get("QA_EMBEDDING_MMAP", "0") == "1"
+
+# =========================
+# SIMILARITY SEARCH
+# =========================
+
+# "exact" scores the whole corpus on every query (brute force).
+# "hnsw" and "ivf" use an ANN index built with: python ann_index.py build
+SEARCH_BACKEND = os.environ.get("QA_SEARCH_BACKEND", "exact")
+
+# Exact search scores the corpus in blocks of SEARCH_BLOCK_SIZE rows,
+# spread over SEARCH_THREADS threads (numpy releases the GIL in matmul).
+# Memory per query is one block of scores per thread.
+SEARCH_BLOCK_SIZE = int(os.environ.get("QA_SEARCH_BLOCK_SIZE", 32768))
+SEARCH_THREADS = int(os.environ.get("QA_SEARCH_THREADS", min(4, os.cpu_count() or 1)))
+
+# HNSW graph (needs hnswlib)
+HNSW_M = int(os.environ.get("QA_HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("QA_HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.environ.get("QA_HNSW_EF_SEARCH", 64))
+
+# Largest top_k asked of the search index; HNSW's ef is set to at least this
+# once at load, never per query (the index is shared by request threads)
+SEARCH_MAX_TOP_K = int(os.environ.get("QA_SEARCH_MAX_TOP_K", 10))
+
+# IVF inverted lists (numpy only)
+IVF_NLIST = int(os.environ.get("QA_IVF_NLIST", 1024))
+IVF_NPROBE = int(os.environ.get("QA_IVF_NPROBE", 16))
+
+# =========================
+# AUTO TAGGING
+# =========================
+
+# "keybert" extracts keywords per request; "vocab" assigns the nearest
+# corpus tags to the question embedding (build: python tag_engine.py build)
+TAG_ENGINE = os.environ.get("QA_TAG_ENGINE", "keybert")
+TAG_ENGINE_DIR = os.environ.get("QA_TAG_ENGINE_DIR", os.path.join(DATA_DIR, "tags"))
+TAG_MIN_SCORE = float(os.environ.get("QA_TAG_MIN_SCORE", 0.35))
+TAG_MIN_COUNT = int(os.environ.get("QA_TAG_MIN_COUNT", 2))
+
+# JSON {category: [synonyms]} for the rule-based matcher; defaults to
+# model_utils.COMMON_TAGS
+TAG_DICTIONARY_PATH = os.environ.get("QA_TAG_DICTIONARY")
+
+# =========================
+# CLUSTERING
+# =========================
+
+# Centroids fit by: python clustering.py fit. Without them new questions
+# are stored with a NULL cluster_id.
+CLUSTER_DIR = os.environ.get("QA_CLUSTER_DIR", os.path.join(DATA_DIR, "clusters"))
+NUM_CLUSTERS = int(os.environ.get("QA_NUM_CLUSTERS", 30))
+
+# =========================
+# API
+# =========================
+
+# Maximum number of questions accepted by /analyze-questions
+MAX_BATCH_QUESTIONS = int(os.environ.get("QA_MAX_BATCH_QUESTIONS", 256))
+
+# Keyset-paginated feeds (/questions, /questions/filtered/<user_id>)
+FEED_PAGE_SIZE = int(os.environ.get("QA_FEED_PAGE_SIZE", 20))
+FEED_MAX_PAGE_SIZE = int(os.environ.get("QA_FEED_MAX_PAGE_SIZE", 100))
+
+# ASGI app (asgi_app.py): model inference and SQLite run on separate
+# bounded thread pools so cheap endpoints are not queued behind encodes.
+# Requests beyond ASGI_MAX_PENDING_INFERENCE waiting for inference get a 503.
+INFERENCE_WORKERS = int(os.environ.get("QA_INFERENCE_WORKERS", 8))
+DB_WORKERS = int(os.environ.get("QA_DB_WORKERS", 16))
+ASGI_MAX_PENDING_INFERENCE = int(os.environ.get("QA_ASGI_MAX_PENDING_INFERENCE", 256))
+
+# /ask-question: "sync" runs the NLP pipeline before answering; "async"
+# inserts the question as pending and enriches it in background workers
+# (enrichment.py), with progress at /questions/<id>/status
+ASK_MODE = os.environ.get("QA_ASK_MODE", "sync")
+ENRICH_WORKERS = int(os.environ.get("QA_ENRICH_WORKERS", 2))
+ENRICH_POLL_SECONDS = float(os.environ.get("QA_ENRICH_POLL_SECONDS", 1.0))
+ENRICH_LEASE_SECONDS = int(os.environ.get("QA_ENRICH_LEASE_SECONDS", 300))
+ENRICH_MAX_ATTEMPTS = int(os.environ.get("QA_ENRICH_MAX_ATTEMPTS", 3))
+
+# Multi-worker serving (gunicorn.conf.py): the master preloads and the
+# workers share the corpus arrays, see preload.py
+SERVE_BIND = os.environ.get("QA_SERVE_BIND", "0.0.0.0:8000")
+SERVE_WORKERS = int(os.environ.get("QA_SERVE_WORKERS", 4))
+SERVE_THREADS = int(os.environ.get("QA_SERVE_THREADS", 8))
+
+# Per-stage and per-route timings at /metrics (metrics.py); "0" makes
+# every timer a no-op
+METRICS_ENABLED = os.environ.get("QA_METRICS", "1") == "1"
+
+# =========================
+# SQLITE
+# =========================
+
+# Idle connections kept per process (see database.ConnectionPool)
+DB_POOL_SIZE = int(os.environ.get("QA_DB_POOL_SIZE", 16))
+DB_BUSY_TIMEOUT = float(os.environ.get("QA_DB_BUSY_TIMEOUT", 5.0))
+DB_CACHE_SIZE_KB = int(os.environ.get("QA_DB_CACHE_SIZE_KB", 20_000))
+DB_MMAP_SIZE = int(os.environ.get("QA_DB_MMAP_SIZE", 256 * 1024 * 1024))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("QA_DB_STATEMENT_CACHE_SIZE", 256))
+
+# =========================
+# CACHING
+# =========================
+
+# Query embeddings shared by /analyze-question and /ask-question
+EMBEDDING_CACHE_SIZE = int(os.environ.get("QA_EMBEDDING_CACHE_SIZE", 4096))
+EMBEDDING_CACHE_TTL = int(os.environ.get("QA_EMBEDDING_CACHE_TTL", 3600))
+
+# Feed and similar-question responses, invalidated on writes (response_cache.py).
+# "memory" keeps entries per process, with versions shared by workers forked from
+# the preloaded master; "redis" (needs the redis package) shares both.
+RESPONSE_CACHE_ENABLED = os.environ.get("QA_RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_BACKEND = os.environ.get("QA_RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_REDIS_URL = os.environ.get("QA_RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_SIZE = int(os.environ.get("QA_RESPONSE_CACHE_SIZE", 2048))
+RESPONSE_CACHE_TTL = int(os.environ.get("QA_RESPONSE_CACHE_TTL", 30))
+
+# Question views are buffered and written back in batches (view_counts.py)
+VIEW_FLUSH_SECONDS = float(os.environ.get("QA_VIEW_FLUSH_SECONDS", 5.0))
+VIEW_FLUSH_PENDING = int(os.environ.get("QA_VIEW_FLUSH_PENDING", 1000))
+
+# =========================
+# CORPUS BUILD
+# =========================
+
+# StackSample dump (Questions.csv, Tags.csv) and the Parquet shards
+# written from it by: python preprocess.py run
+RAW_DATASET_DIR = os.environ.get("QA_RAW_DATASET_DIR", os.path.join(DATA_DIR, "raw", "stacksample"))
+PREPROCESS_DIR = os.environ.get("QA_PREPROCESS_DIR", os.path.join(DATA_DIR, "processed", "shards"))
+SPACY_MODEL = os.environ.get("QA_SPACY_MODEL", "en_core_web_sm")
+PREPROCESS_WORKERS = int(os.environ.get("QA_PREPROCESS_WORKERS", os.cpu_count() or 1))
+
+# Shard checkpoints of: python embedding_build.py build
+EMBED_BUILD_DIR = os.environ.get("QA_EMBED_BUILD_DIR", os.path.join(DATA_DIR, "embeddings", "shards"))
+EMBED_WORKERS = int(os.environ.get("QA_EMBED_WORKERS", os.cpu_count() or 1))
@@ -0,0 +1,266 @@
+"""
+Storage for the corpus embedding matrix.
+
+The raw question_embeddings.npy is float32 and loaded fully into RAM by
+default. Packed variants hold L2-normalized rows as float32, float16, or
+int8 with a per-row scale, and can be memory-mapped so several workers
+share one copy through the page cache. Scoring dequantizes block by block.
+
+    python corpus_embeddings.py pack --dtype int8
+    python corpus_embeddings.py evaluate --dtype int8 --queries 1000
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+import config
+
+DTYPES = ("float32", "float16", "int8")
+
+
+# =========================
+# HELPERS
+# =========================
+
+def normalize_rows(matrix):
+    """
+    L2-normalize rows so a dot product equals cosine similarity
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def packed_paths(dtype, embeddings_path=None):
+    """
+    question_embeddings.npy -> question_embeddings.int8.npy (+ .scales.npy)
+    """
+    stem = os.path.splitext(embeddings_path or config.EMBEDDINGS_PATH)[0]
+    return f"{stem}.{dtype}.npy", f"{stem}.{dtype}.scales.npy"
+
+
+def embedding_rows(embeddings_path=None):
+    """
+    Rows of the corpus matrix, read from the .npy header only
+    """
+    embeddings_path = embeddings_path or config.EMBEDDINGS_PATH
+    if not os.path.exists(embeddings_path):
+        embeddings_path = packed_paths(config.EMBEDDING_DTYPE, embeddings_path)[0]
+    return np.load(embeddings_path, mmap_mode="r").shape[0]
+
+
+def quantize(vectors, dtype):
+    """
+    Returns (data, scales). Scales are only used for int8.
+    """
+    if dtype == "float32":
+        return vectors.astype(np.float32), None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.round(vectors / scales[:, None]).astype(np.int8)
+        return data, scales.astype(np.float32)
+    raise ValueError(f"Unknown embedding dtype: {dtype}")
+
+
+# =========================
+# EMBEDDING MATRIX
+# =========================
+
+class EmbeddingMatrix:
+    """
+    Normalized corpus embeddings in float32, float16 or int8 (+ row scales).
+    Backing arrays may be memory-mapped.
+    """
+
+    def __init__(self, data, scales=None, block_size=65536):
+        self.data = data
+        self.scales = scales
+        self.block_size = block_size
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype.name
+
+    @property
+    def nbytes(self):
+        scale_bytes = self.scales.nbytes if self.scales is not None else 0
+        return self.data.nbytes + scale_bytes
+
+    def block(self, start, stop):
+        """
+        Rows [start, stop) dequantized to float32 (a view for float32 storage)
+        """
+        rows = self.data[start:stop].astype(np.float32, copy=False)
+        if self.scales is not None:
+            rows = rows * self.scales[start:stop, None]
+        return rows
+
+    def block_scores(self, queries, start, stop):
+        """
+        (queries x rows) cosine similarities of normalized queries against
+        rows [start, stop). Only float16 / int8 blocks are converted, and
+        int8 scales are applied to the scores rather than the rows:
+        (q . x_int8) * scale == q . (x_int8 * scale)
+        """
+        block = self.data[start:stop].astype(np.float32, copy=False)
+        scores = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales[start:stop]
+        return scores
+
+    def __getitem__(self, index):
+        return self.block(index, index + 1)[0]
+
+    def scores(self, query):
+        """
+        Cosine similarity of a normalized query against every row.
+        Works block by block so dequantization never copies the whole matrix.
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        out = np.empty(len(self), dtype=np.float32)
+
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            out[start:stop] = self.block_scores(query, start, stop)[0]
+        return out
+
+
+def load_embeddings(dtype=None, mmap=None, embeddings_path=None):
+    """
+    Load the corpus matrix in the configured storage mode.
+    float32 without mmap reads the raw .npy (original behaviour);
+    every other mode reads a file produced by `pack`.
+    """
+    dtype = dtype or config.EMBEDDING_DTYPE
+    mmap = config.EMBEDDING_MMAP if mmap is None else mmap
+    embeddings_path = embeddings_path or config.EMBEDDINGS_PATH
+
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {dtype}")
+
+    if dtype != "float32" or mmap:
+        data_path, scales_path = packed_paths(dtype, embeddings_path)
+        if os.path.exists(data_path):
+            mmap_mode = "r" if mmap else None
+            data = np.load(data_path, mmap_mode=mmap_mode)
+            scales = np.load(scales_path, mmap_mode=mmap_mode) if dtype == "int8" else None
+            return EmbeddingMatrix(data, scales)
+
+        print(f"⚠️  {data_path} not found (run: python corpus_embeddings.py pack --dtype {dtype}), "
+              f"loading float32 embeddings into RAM")
+
+    return EmbeddingMatrix(normalize_rows(np.load(embeddings_path)))
+
+
+# =========================
+# PACK / EVALUATE
+# =========================
+
+def pack(dtype, embeddings_path=None):
+    embeddings_path = embeddings_path or config.EMBEDDINGS_PATH
+    vectors = normalize_rows(np.load(embeddings_path))
+    data, scales = quantize(vectors, dtype)
+
+    data_path, scales_path = packed_paths(dtype, embeddings_path)
+    np.save(data_path, data)
+    if scales is not None:
+        np.save(scales_path, scales)
+
+    size = data.nbytes + (scales.nbytes if scales is not None else 0)
+    print(f"✅ Wrote {data_path}")
+    print(f"   {vectors.nbytes / 1e6:.1f} MB float32 -> {size / 1e6:.1f} MB {dtype}")
+
+
+def recall_at_k(reference, candidate, queries, top_k=10, exclude=None):
+    """
+    Mean overlap between the top_k rows of the reference and candidate
+    matrices. Rows in exclude (held-out queries) are never counted.
+    """
+    exclude = np.asarray(exclude if exclude is not None else [], dtype=np.int64)
+    top_k = min(top_k, len(reference) - len(exclude))
+    if top_k <= 0:
+        raise ValueError("No rows left to search once the queries are held out")
+
+    def top_rows(matrix, query):
+        scores = matrix.scores(query)
+        scores[exclude] = -np.inf
+        return np.argpartition(-scores, top_k - 1)[:top_k]
+
+    total = 0.0
+    for query in queries:
+        expected = top_rows(reference, query)
+        found = top_rows(candidate, query)
+        total += len(set(expected.tolist()) & set(found.tolist())) / top_k
+    return total / len(queries)
+
+
+def evaluate(dtype, num_queries=1000, top_k=10, queries_path=None, embeddings_path=None):
+    """
+    Report memory and recall@k of a packed matrix against float32.
+    Queries come from queries_path (.npy), or are real corpus rows held
+    out of the search, so no query finds itself or a noisy copy of itself.
+    """
+    reference = load_embeddings("float32", mmap=False, embeddings_path=embeddings_path)
+    candidate = load_embeddings(dtype, mmap=True, embeddings_path=embeddings_path)
+
+    held_out = None
+    if queries_path:
+        queries = normalize_rows(np.load(queries_path))
+    else:
+        rng = np.random.default_rng(42)
+        held_out = rng.choice(len(reference), min(num_queries, len(reference) // 2), replace=False)
+        queries = np.stack([reference[i] for i in held_out])
+
+    top_k = min(top_k, len(reference) - len(held_out if held_out is not None else []))
+    recall = recall_at_k(reference, candidate, queries, top_k=top_k, exclude=held_out)
+
+    print(f"📊 {dtype} vs float32 over {len(queries)} queries")
+    print(f"   Memory   : {reference.nbytes / 1e6:.1f} MB -> {candidate.nbytes / 1e6:.1f} MB "
+          f"({reference.nbytes / candidate.nbytes:.1f}x smaller)")
+    print(f"   Recall@{top_k}: {recall:.4f}")
+    return recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack and evaluate corpus embedding storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pack_cmd = sub.add_parser("pack", help="Write a normalized, optionally quantized copy")
+    pack_cmd.add_argument("--dtype", choices=DTYPES, default="int8")
+    pack_cmd.add_argument("--embeddings", default=config.EMBEDDINGS_PATH)
+
+    eval_cmd = sub.add_parser("evaluate", help="Report recall impact of a packed copy")
+    eval_cmd.add_argument("--dtype", choices=DTYPES, default="int8")
+    eval_cmd.add_argument("--queries", type=int, default=1000)
+    eval_cmd.add_argument("--queries-file", default=None)
+    eval_cmd.add_argument("--top-k", type=int, default=10)
+    eval_cmd.add_argument("--embeddings", default=config.EMBEDDINGS_PATH)
+
+    args = parser.parse_args()
+    if args.command == "pack":
+        pack(args.dtype, embeddings_path=args.embeddings)
+    else:
+        evaluate(
+            args.dtype,
+            num_queries=args.queries,
+            top_k=args.top_k,
+            queries_path=args.queries_file,
+            embeddings_path=args.embeddings
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Packed, memory-mapped store for the served corpus columns.
+
+The server only reads Processed_Text, final_rank_score and Tags_List from
+final_dataset_ranked.csv. The build step writes just those columns into
+a directory of flat arrays:
+
+    rank_score.npy      float32, one per row
+    text.bin            UTF-8 Processed_Text, concatenated
+    text_offsets.npy    int64, row i is text.bin[off[i]:off[i+1]]
+    tags.bin            raw Tags_List strings, concatenated
+    tags_offsets.npy    int64
+    snippet_ends.npy    int64, end in text.bin of row i's first SNIPPET_CHARS characters
+    tag_ids.npy         int32 ids into tag_vocab.json, row i is tag_ids[t[i]:t[i+1]]
+    tag_offsets.npy     int64 (t above)
+    tag_vocab.json      every distinct tag, in id order
+    meta.json           row count
+
+Files are memory-mapped on first access, so startup does not parse the
+CSV and workers share pages through the OS cache.
+
+The snippet and tag files are the precomputed result payloads: a search
+hit is rendered from them by array indexing alone (see CorpusPayloads),
+with no pandas row or tag regex per request.
+
+    python corpus_store.py build
+    python corpus_store.py payloads     # add payload files to an older store
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+import config
+
+SERVED_COLUMNS = ["Processed_Text", "final_rank_score", "Tags_List"]
+
+# Length of the question text returned with each search hit
+SNIPPET_CHARS = 200
+
+PAYLOAD_FILES = ["snippet_ends.npy", "tag_ids.npy", "tag_offsets.npy", "tag_vocab.json"]
+
+TAG_PATTERN = re.compile(r"'([^']+)'")
+
+
+def split_tags(value):
+    """
+    Tags from a Tags_List string: "['python' 'pandas']" -> ['python', 'pandas']
+    """
+    if not isinstance(value, str):
+        return []
+    return TAG_PATTERN.findall(value)
+
+
+# =========================
+# RESULT PAYLOADS
+# =========================
+
+class CorpusPayloads:
+    """
+    Per-row search hit payloads in flat arrays: the snippet is
+    blob[snippet_starts[i]:snippet_stops[i]], the tags are
+    tag_vocab[tag_ids[tag_offsets[i]:tag_offsets[i + 1]]].
+    Arrays may be memory-mapped.
+    """
+
+    def __init__(self, blob, snippet_starts, snippet_stops, tag_ids, tag_offsets, tag_vocab, rank_scores):
+        self.blob = blob
+        self.snippet_starts = snippet_starts
+        self.snippet_stops = snippet_stops
+        self.tag_ids = tag_ids
+        self.tag_offsets = tag_offsets
+        self.tag_vocab = tag_vocab
+        self.rank_scores = rank_scores
+
+    def hits(self, indices):
+        """
+        (snippet, rank_score, tags) for each corpus row in indices
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        snippet_starts = self.snippet_starts[indices].tolist()
+        snippet_stops = self.snippet_stops[indices].tolist()
+        tag_starts = self.tag_offsets[indices].tolist()
+        tag_stops = self.tag_offsets[indices + 1].tolist()
+        rank_scores = self.rank_scores[indices].tolist()
+
+        blob, tag_ids, vocab = self.blob, self.tag_ids, self.tag_vocab
+        return [
+            (
+                blob[s_start:s_stop].tobytes().decode("utf-8"),
+                rank_score,
+                [vocab[t] for t in tag_ids[t_start:t_stop].tolist()]
+            )
+            for s_start, s_stop, t_start, t_stop, rank_score
+            in zip(snippet_starts, snippet_stops, tag_starts, tag_stops, rank_scores)
+        ]
+
+
+class PayloadBuilder:
+    """
+    Accumulates snippet lengths and tag ids row by row
+    """
+
+    def __init__(self):
+        self.snippet_lengths = []
+        self.tag_ids = []
+        self.tag_offsets = [0]
+        self.vocab = {}
+
+    def add(self, text, tags_raw):
+        """
+        Record one row; returns its UTF-8 encoded snippet
+        """
+        snippet = text[:SNIPPET_CHARS].encode("utf-8")
+        self.snippet_lengths.append(len(snippet))
+        for tag in split_tags(tags_raw):
+            self.tag_ids.append(self.vocab.setdefault(tag, len(self.vocab)))
+        self.tag_offsets.append(len(self.tag_ids))
+        return snippet
+
+    def arrays(self, text_offsets):
+        """
+        Payload arrays for a text blob laid out by text_offsets
+        """
+        return {
+            "snippet_ends": np.asarray(text_offsets[:-1], dtype=np.int64)
+                            + np.array(self.snippet_lengths, dtype=np.int64),
+            "tag_ids": np.array(self.tag_ids, dtype=np.int32),
+            "tag_offsets": np.array(self.tag_offsets, dtype=np.int64),
+            "tag_vocab": list(self.vocab)
+        }
+
+
+def save_payloads(arrays, store_dir):
+    for name in ["snippet_ends", "tag_ids", "tag_offsets"]:
+        np.save(os.path.join(store_dir, f"{name}.npy"), arrays[name])
+    with open(os.path.join(store_dir, "tag_vocab.json"), "w") as f:
+        json.dump(arrays["tag_vocab"], f)
+
+
+# =========================
+# PACKED STORE
+# =========================
+
+class PackedCorpus:
+    """
+    Read-only view over a directory written by build_store
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self._loaded = False
+        self._payloads = None
+        self._payloads_lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.store_dir, name)
+
+    def _load(self):
+        if self._loaded:
+            return
+        self.rank_scores = np.load(self._path("rank_score.npy"), mmap_mode="r")
+        self.text_offsets = np.load(self._path("text_offsets.npy"), mmap_mode="r")
+        self.tags_offsets = np.load(self._path("tags_offsets.npy"), mmap_mode="r")
+        self.text_blob = np.memmap(self._path("text.bin"), dtype=np.uint8, mode="r")
+        self.tags_blob = np.memmap(self._path("tags.bin"), dtype=np.uint8, mode="r")
+        self._loaded = True
+
+    @staticmethod
+    def exists(store_dir):
+        return os.path.exists(os.path.join(store_dir, "meta.json"))
+
+    def __len__(self):
+        self._load()
+        return len(self.rank_scores)
+
+    def _slice(self, blob, offsets, idx):
+        start, stop = int(offsets[idx]), int(offsets[idx + 1])
+        return blob[start:stop].tobytes().decode("utf-8")
+
+    def text(self, idx):
+        self._load()
+        return self._slice(self.text_blob, self.text_offsets, idx)
+
+    def tags_raw(self, idx):
+        self._load()
+        value = self._slice(self.tags_blob, self.tags_offsets, idx)
+        return value or None
+
+    def rank_score(self, idx):
+        self._load()
+        return float(self.rank_scores[idx])
+
+    def row(self, idx):
+        """
+        Same keys as a row of the ranked CSV (served columns only)
+        """
+        return {
+            "Processed_Text": self.text(idx),
+            "final_rank_score": self.rank_score(idx),
+            "Tags_List": self.tags_raw(idx)
+        }
+
+    def has_payload_files(self):
+        return all(os.path.exists(self._path(name)) for name in PAYLOAD_FILES)
+
+    def build_payload_arrays(self):
+        """
+        Snippet ends and tag ids computed from text.bin / tags.bin
+        """
+        self._load()
+        builder = PayloadBuilder()
+        for idx in range(len(self)):
+            builder.add(self.text(idx), self.tags_raw(idx))
+        return builder.arrays(self.text_offsets)
+
+    @property
+    def payloads(self):
+        if self._payloads is None:
+            with self._payloads_lock:
+                if self._payloads is None:
+                    self._payloads = self._load_payloads()
+        return self._payloads
+
+    def _load_payloads(self):
+        self._load()
+        if self.has_payload_files():
+            arrays = {
+                name: np.load(self._path(f"{name}.npy"), mmap_mode="r")
+                for name in ["snippet_ends", "tag_ids", "tag_offsets"]
+            }
+            with open(self._path("tag_vocab.json")) as f:
+                arrays["tag_vocab"] = json.load(f)
+        else:
+            print(f"⚠️  No result payloads in {self.store_dir} "
+                  f"(run: python corpus_store.py payloads), building them in memory")
+            arrays = self.build_payload_arrays()
+
+        return CorpusPayloads(
+            self.text_blob,
+            self.text_offsets[:-1],
+            arrays["snippet_ends"],
+            arrays["tag_ids"],
+            arrays["tag_offsets"],
+            arrays["tag_vocab"],
+            self.rank_scores
+        )
+
+
+# =========================
+# CSV FALLBACK
+# =========================
+
+class CsvCorpus:
+    """
+    Original behaviour: the ranked CSV in pandas, restricted to served columns
+    """
+
+    def __init__(self, csv_path):
+        import pandas as pd
+
+        self.df = pd.read_csv(
+            csv_path,
+            encoding="latin1",
+            usecols=SERVED_COLUMNS,
+            low_memory=False
+        )
+        self._payloads = None
+        self._payloads_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def payloads(self):
+        """
+        Built in memory on first access: snippets are re-encoded into one
+        blob, Tags_List parsed once
+        """
+        if self._payloads is None:
+            with self._payloads_lock:
+                if self._payloads is None:
+                    self._payloads = self._build_payloads()
+        return self._payloads
+
+    def _build_payloads(self):
+        builder = PayloadBuilder()
+        snippets = [
+            builder.add(text, tags)
+            for text, tags in zip(
+                self.df["Processed_Text"].fillna("").astype(str),
+                self.df["Tags_List"]
+            )
+        ]
+        offsets = np.concatenate([[0], np.cumsum(builder.snippet_lengths, dtype=np.int64)])
+        arrays = builder.arrays(offsets)
+
+        return CorpusPayloads(
+            np.frombuffer(b"".join(snippets), dtype=np.uint8),
+            offsets[:-1],
+            arrays["snippet_ends"],
+            arrays["tag_ids"],
+            arrays["tag_offsets"],
+            arrays["tag_vocab"],
+            self.df["final_rank_score"].fillna(0).to_numpy(np.float32)
+        )
+
+    def row(self, idx):
+        row = self.df.iloc[idx]
+        return {
+            "Processed_Text": row["Processed_Text"],
+            "final_rank_score": float(row["final_rank_score"]),
+            "Tags_List": row["Tags_List"]
+        }
+
+    def text(self, idx):
+        text = self.df["Processed_Text"].iat[idx]
+        return text if isinstance(text, str) else ""
+
+
+def load_corpus(store_dir=None, csv_path=None):
+    """
+    Packed store if it has been built, otherwise the CSV
+    """
+    store_dir = store_dir or config.CORPUS_DIR
+    csv_path = csv_path or config.RANKED_DATASET_PATH
+
+    if PackedCorpus.exists(store_dir):
+        return PackedCorpus(store_dir)
+
+    print(f"⚠️  No packed corpus at {store_dir} (run: python corpus_store.py build), "
+          f"loading {csv_path}")
+    return CsvCorpus(csv_path)
+
+
+# =========================
+# BUILD
+# =========================
+
+def write_store(chunks, store_dir):
+    """
+    Write the packed columns from an iterable of DataFrames holding
+    SERVED_COLUMNS. Returns the number of rows written.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    meta_path = os.path.join(store_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    rank_scores = []
+    text_offsets = [0]
+    tags_offsets = [0]
+    payloads = PayloadBuilder()
+
+    with open(os.path.join(store_dir, "text.bin"), "wb") as text_file, \
+            open(os.path.join(store_dir, "tags.bin"), "wb") as tags_file:
+        for chunk in chunks:
+            rank_scores.append(chunk["final_rank_score"].fillna(0).to_numpy(np.float32))
+
+            texts = chunk["Processed_Text"].fillna("").astype(str)
+            tag_lists = chunk["Tags_List"].fillna("").astype(str)
+            for text, tags in zip(texts, tag_lists):
+                payloads.add(text, tags)
+
+                encoded = text.encode("utf-8")
+                text_file.write(encoded)
+                text_offsets.append(text_offsets[-1] + len(encoded))
+
+                encoded = tags.encode("utf-8")
+                tags_file.write(encoded)
+                tags_offsets.append(tags_offsets[-1] + len(encoded))
+
+            print(f"  ✓ {len(text_offsets) - 1} rows")
+
+    rank_scores = np.concatenate(rank_scores) if rank_scores else np.empty(0, np.float32)
+    np.save(os.path.join(store_dir, "rank_score.npy"), rank_scores)
+    np.save(os.path.join(store_dir, "text_offsets.npy"), np.array(text_offsets, dtype=np.int64))
+    np.save(os.path.join(store_dir, "tags_offsets.npy"), np.array(tags_offsets, dtype=np.int64))
+    save_payloads(payloads.arrays(text_offsets), store_dir)
+
+    # Written last: its presence marks a complete store
+    with open(meta_path, "w") as f:
+        json.dump({"rows": len(rank_scores), "columns": SERVED_COLUMNS}, f)
+
+    return len(rank_scores)
+
+
+def build_store(csv_path=None, store_dir=None, chunksize=100_000):
+    """
+    Stream the ranked CSV in chunks and write the packed columns
+    """
+    import pandas as pd
+
+    csv_path = csv_path or config.RANKED_DATASET_PATH
+    store_dir = store_dir or config.CORPUS_DIR
+
+    print(f"🚀 Packing {csv_path} -> {store_dir}")
+
+    reader = pd.read_csv(
+        csv_path,
+        encoding="latin1",
+        usecols=SERVED_COLUMNS,
+        chunksize=chunksize
+    )
+    rows = write_store(reader, store_dir)
+
+    print(f"✅ Packed {rows} rows")
+
+
+def build_payloads(store_dir=None):
+    """
+    Add the result payload files to a store packed before they existed
+    """
+    store_dir = store_dir or config.CORPUS_DIR
+    if not PackedCorpus.exists(store_dir):
+        raise SystemExit(f"⚠️  No packed corpus at {store_dir} (run: python corpus_store.py build)")
+    corpus = PackedCorpus(store_dir)
+
+    print(f"🚀 Building result payloads for {len(corpus)} rows in {store_dir}")
+    arrays = corpus.build_payload_arrays()
+    save_payloads(arrays, store_dir)
+    print(f"✅ {len(arrays['tag_vocab'])} distinct tags, {len(arrays['tag_ids'])} row tags")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the packed corpus store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Convert the ranked CSV to the packed layout")
+    build.add_argument("--csv", default=config.RANKED_DATASET_PATH)
+    build.add_argument("--out", default=config.CORPUS_DIR)
+    build.add_argument("--chunksize", type=int, default=100_000)
+
+    payloads = sub.add_parser("payloads", help="Add result payload files to an existing store")
+    payloads.add_argument("--out", default=config.CORPUS_DIR)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_store(args.csv, args.out, chunksize=args.chunksize)
+    elif args.command == "payloads":
+        build_payloads(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,119 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
+
+import config
+import metrics
 
 DB_NAME = "qa.db"
 
-def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Applied to every new connection. journal_mode=WAL lets readers run
+# alongside a writer; it is persistent in the file, the rest are per connection.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{config.DB_CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {config.DB_MMAP_SIZE}",
+    f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT * 1000)}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Connection whose close() hands it back to the pool instead of closing,
+    so routes keep their get_db() / db.close() pattern while the
+    connection, its page cache and its prepared statement cache are reused.
+    """
+
+    pool = None
+    acquired_at = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+            return
+        if self.in_transaction:
+            self.rollback()
+        if self.acquired_at is not None:
+            metrics.DB_SECONDS.observe(time.perf_counter() - self.acquired_at)
+            self.acquired_at = None
+        self.pool.release(self)
+
+    def really_close(self):
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Idle connections to one database file, shared across request threads.
+    A connection is only ever used by the thread that checked it out.
+    """
+
+    def __init__(self, path, max_idle):
+        self.path = path
+        self.max_idle = max_idle
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self.created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=config.DB_BUSY_TIMEOUT,
+            factory=PooledConnection,
+            check_same_thread=False,
+            cached_statements=config.DB_STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.pool = self
+        self.created += 1
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        if metrics.ENABLED:
+            conn.acquired_at = time.perf_counter()
+        return conn
+
+    def release(self, conn):
+        if self._idle.qsize() < self.max_idle:
+            self._idle.put(conn)
+        else:
+            conn.really_close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().really_close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    path = path or DB_NAME
+    pool = _pools.get(path)
+
+    # Connections must not cross a fork; each process builds its own pool
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None or pool.pid != os.getpid():
+                pool = ConnectionPool(path, config.DB_POOL_SIZE)
+                _pools[path] = pool
+    return pool
+
+
+def get_db(path=None):
+    return get_pool(path).acquire()
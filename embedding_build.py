@@ -0,0 +1,281 @@
+"""
+Incremental corpus embedding build: corpus texts -> question_embeddings.npy.
+
+Replaces the single model.encode(texts) call in stetment_bert.ipynb.
+Texts come from the served corpus (load_corpus), so row i of the matrix
+is always row i of the corpus. Rows are processed in shards of
+--shard-rows, each checkpointed as it completes:
+
+    <build dir>/shard-00000.npy          float32 embeddings of rows [0, shard_rows)
+    <build dir>/shard-00000.hashes.npy   uint64 content hash per row
+
+A row's hash covers the model name and its Processed_Text. Rows whose
+hash is found in the previous build (question_embeddings.hashes.npy,
+written next to the matrix) are copied instead of encoded, so new or
+edited questions are the only ones encoded. A shard whose checkpoint
+already matches is skipped, so an interrupted build resumes where it
+stopped.
+
+Texts to encode are sorted by length before batching, so each batch
+pads to a similar length, and spread over a multi-process CPU pool
+(SentenceTransformer.start_multi_process_pool). The shards are then
+stitched into the float32 .npy the server loads; packed copies and ANN
+indexes built from the old matrix need rebuilding afterwards.
+
+    python embedding_build.py build --workers 8
+"""
+
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+
+import config
+from corpus_store import load_corpus
+
+
+# =========================
+# CONTENT HASHES
+# =========================
+
+def hashes_path(embeddings_path):
+    """
+    question_embeddings.npy -> question_embeddings.hashes.npy
+    """
+    return embeddings_path[:-len(".npy")] + ".hashes.npy"
+
+
+def content_hashes(texts, model_name):
+    """
+    64-bit hash of (model name, text) per row
+    """
+    key = model_name.encode("utf-8")[:64]
+    return np.array([
+        int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8, key=key).digest(), "little")
+        for text in texts
+    ], dtype=np.uint64)
+
+
+class PreviousBuild:
+    """
+    Rows of the last stitched matrix, looked up by content hash
+    """
+
+    def __init__(self, vectors, hashes):
+        self.vectors = vectors
+        self.order = np.argsort(hashes)
+        self.sorted_hashes = hashes[self.order]
+
+    @classmethod
+    def load(cls, embeddings_path, dim):
+        path = hashes_path(embeddings_path)
+        if not (os.path.exists(embeddings_path) and os.path.exists(path)):
+            return None
+
+        vectors = np.load(embeddings_path, mmap_mode="r")
+        hashes = np.load(path)
+        if len(vectors) != len(hashes) or vectors.shape[1] != dim:
+            print(f"⚠️  {path} does not match {embeddings_path}, encoding every row")
+            return None
+        return cls(vectors, hashes)
+
+    def find(self, hashes):
+        """
+        Row of each hash in the previous matrix, or -1
+        """
+        if len(self.sorted_hashes) == 0:
+            return np.full(len(hashes), -1, dtype=np.int64)
+
+        pos = np.minimum(np.searchsorted(self.sorted_hashes, hashes), len(self.sorted_hashes) - 1)
+        found = self.sorted_hashes[pos] == hashes
+        return np.where(found, self.order[pos], -1)
+
+
+# =========================
+# ENCODING
+# =========================
+
+class EncodePool:
+    """
+    SentenceTransformer multi-process CPU pool; a plain encode() with one
+    worker or a model without multi-process support
+    """
+
+    def __init__(self, model, workers, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.pool = None
+        if workers > 1 and hasattr(model, "start_multi_process_pool"):
+            self.pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    def encode(self, texts):
+        if self.pool is not None:
+            return self.model.encode_multi_process(texts, self.pool, batch_size=self.batch_size)
+        return self.model.encode(texts, batch_size=self.batch_size)
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+
+def encode_length_sorted(pool, texts):
+    """
+    Encode texts longest first so batches hold similar lengths (less
+    padding); returns rows in the input order
+    """
+    order = np.argsort([-len(text) for text in texts], kind="stable")
+    encoded = pool.encode([texts[i] for i in order])
+    out = np.empty_like(encoded)
+    out[order] = encoded
+    return out
+
+
+# =========================
+# BUILD
+# =========================
+
+def shard_paths(build_dir, shard):
+    base = os.path.join(build_dir, f"shard-{shard:05d}")
+    return base + ".npy", base + ".hashes.npy"
+
+
+def save_atomic(path, array):
+    tmp_path = path[:-len(".npy")] + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def shard_done(build_dir, shard, hashes):
+    vectors_path, shard_hashes_path = shard_paths(build_dir, shard)
+    if not (os.path.exists(vectors_path) and os.path.exists(shard_hashes_path)):
+        return False
+    return np.array_equal(np.load(shard_hashes_path), hashes)
+
+
+def build_shard(texts, hashes, previous, pool, dim):
+    """
+    (embeddings, number of rows encoded) for one shard
+    """
+    vectors = np.empty((len(texts), dim), dtype=np.float32)
+    reuse = previous.find(hashes) if previous else np.full(len(texts), -1, dtype=np.int64)
+
+    hits = np.flatnonzero(reuse >= 0)
+    if len(hits):
+        # Sorted row order keeps reads from the memory-mapped matrix sequential
+        src = reuse[hits]
+        by_src = np.argsort(src)
+        vectors[hits[by_src]] = previous.vectors[src[by_src]]
+
+    missing = np.flatnonzero(reuse < 0)
+    if len(missing):
+        vectors[missing] = encode_length_sorted(pool, [texts[i] for i in missing])
+    return vectors, len(missing)
+
+
+def stitch(build_dir, num_shards, rows, dim, embeddings_path):
+    """
+    Concatenate the shard checkpoints into embeddings_path (+ hashes)
+    """
+    tmp_path = embeddings_path[:-len(".npy")] + ".tmp.npy"
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(rows, dim))
+    hashes = []
+
+    start = 0
+    for shard in range(num_shards):
+        vectors_path, shard_hashes_path = shard_paths(build_dir, shard)
+        vectors = np.load(vectors_path, mmap_mode="r")
+        out[start:start + len(vectors)] = vectors
+        hashes.append(np.load(shard_hashes_path))
+        start += len(vectors)
+
+    out.flush()
+    del out
+
+    # The hash file goes last: a matrix without one is never reused
+    path = hashes_path(embeddings_path)
+    if os.path.exists(path):
+        os.remove(path)
+    os.replace(tmp_path, embeddings_path)
+    save_atomic(path, np.concatenate(hashes) if hashes else np.empty(0, np.uint64))
+
+
+def build(embeddings_path=None, build_dir=None, workers=None, shard_rows=100_000,
+          batch_size=None, model=None, model_name=None, corpus=None):
+    """
+    Encode the corpus incrementally (see module doc). model and corpus
+    default to config.SBERT_MODEL_NAME and load_corpus().
+    """
+    embeddings_path = embeddings_path or config.EMBEDDINGS_PATH
+    build_dir = build_dir or config.EMBED_BUILD_DIR
+    workers = workers or config.EMBED_WORKERS
+    batch_size = batch_size or config.ENCODE_BATCH_SIZE
+    model_name = model_name or config.SBERT_MODEL_NAME
+
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device="cpu")
+    corpus = corpus if corpus is not None else load_corpus()
+
+    os.makedirs(build_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(embeddings_path) or ".", exist_ok=True)
+
+    rows = len(corpus)
+    dim = model.get_sentence_embedding_dimension()
+    num_shards = (rows + shard_rows - 1) // shard_rows
+    previous = PreviousBuild.load(embeddings_path, dim)
+
+    print(f"🚀 Embedding {rows} rows in {num_shards} shards -> {embeddings_path} ({workers} workers)")
+    start = time.perf_counter()
+    progress = {"skipped": 0, "encoded": 0, "reused": 0}
+
+    pool = EncodePool(model, workers, batch_size)
+    try:
+        for shard in range(num_shards):
+            shard_start = shard * shard_rows
+            texts = [corpus.text(i) for i in range(shard_start, min(shard_start + shard_rows, rows))]
+            hashes = content_hashes(texts, model_name)
+
+            if shard_done(build_dir, shard, hashes):
+                progress["skipped"] += 1
+                continue
+
+            vectors, encoded = build_shard(texts, hashes, previous, pool, dim)
+            vectors_path, shard_hashes_path = shard_paths(build_dir, shard)
+            save_atomic(vectors_path, vectors)
+            save_atomic(shard_hashes_path, hashes)
+
+            progress["encoded"] += encoded
+            progress["reused"] += len(texts) - encoded
+            print(f"  ✓ shard {shard}: {encoded} encoded, {len(texts) - encoded} reused")
+    finally:
+        pool.close()
+
+    stitch(build_dir, num_shards, rows, dim, embeddings_path)
+
+    print(f"✅ {progress['encoded']} rows encoded, {progress['reused']} reused, "
+          f"{progress['skipped']} shards already done, in {time.perf_counter() - start:.1f}s")
+    print("   Rebuild packed copies and ANN indexes: "
+          "python corpus_embeddings.py pack / python ann_index.py build")
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the corpus embedding matrix incrementally")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = sub.add_parser("build", help="Encode new or changed rows and stitch the matrix")
+    build_cmd.add_argument("--embeddings", default=config.EMBEDDINGS_PATH)
+    build_cmd.add_argument("--build-dir", default=config.EMBED_BUILD_DIR)
+    build_cmd.add_argument("--workers", type=int, default=config.EMBED_WORKERS)
+    build_cmd.add_argument("--shard-rows", type=int, default=100_000)
+    build_cmd.add_argument("--batch-size", type=int, default=config.ENCODE_BATCH_SIZE)
+
+    args = parser.parse_args()
+    build(args.embeddings, args.build_dir, args.workers, args.shard_rows, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Bounded LRU cache for query embeddings.
+
+Shared by analyze_question and process_new_question so that the text a
+user searched with /analyze-question is not re-encoded by /ask-question.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """
+    Cache key for a question: case-folded, whitespace-collapsed, without
+    trailing punctuation. all-MiniLM-L6-v2 is uncased, so case folding
+    does not change the embedding.
+    """
+    text = " ".join(text.lower().split())
+    return re.sub(r"[\s?!.]+$", "", text)
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache with a size bound and a per-entry TTL
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, text):
+        key = normalize_text(text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            embedding, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, text, embedding):
+        key = normalize_text(text)
+        # Cached arrays are shared between callers
+        embedding.flags.writeable = False
+
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, text, compute):
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = compute(text)
+            self.put(text, embedding)
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,271 @@
+"""
+Accept now, enrich later: background NLP for posted questions.
+
+With QA_ASK_MODE=async, /ask-question inserts the question with
+status "pending" together with a row in enrichment_jobs, and returns.
+A pool of worker threads claims queued jobs, runs process_new_question
+(encode, corpus search, tagging, rank) and writes the result back to
+the question, which becomes "ready".
+
+Jobs live in SQLite, so a restart loses nothing: a job is claimed with a
+lease, and a "running" job whose lease has expired (its process died)
+is claimed again. Both failed and abandoned attempts count towards
+ENRICH_MAX_ATTEMPTS, after which the job and its question are "failed".
+"""
+
+import json
+import os
+import threading
+import traceback
+
+import config
+from database import get_db
+from models import set_question_tags
+from question_embeddings import question_store, to_blob
+
+
+# =========================
+# JOB TABLE
+# =========================
+
+def enqueue(cursor, question_id):
+    cursor.execute("""
+        INSERT INTO enrichment_jobs (question_id) VALUES (?)
+    """, (question_id,))
+
+
+def _lease_expiry():
+    return f"-{int(config.ENRICH_LEASE_SECONDS)} seconds"
+
+
+def claim_job(cursor):
+    """
+    Atomically mark the oldest queued (or abandoned) job as running.
+    An abandoned job is only reclaimed while it has attempts left.
+    Returns the job row or None.
+    """
+    cursor.execute("""
+        UPDATE enrichment_jobs
+        SET status = 'running', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = (
+            SELECT id FROM enrichment_jobs
+            WHERE status = 'queued'
+               OR (status = 'running' AND updated_at < datetime('now', ?) AND attempts < ?)
+            ORDER BY id
+            LIMIT 1
+        )
+        RETURNING id, question_id, attempts
+    """, (_lease_expiry(), config.ENRICH_MAX_ATTEMPTS))
+    return cursor.fetchone()
+
+
+def fail_abandoned_jobs(cursor):
+    """
+    Mark jobs whose worker died on their last allowed attempt (lease
+    expired, no attempts left) as failed, with their questions.
+    Returns the number of jobs failed.
+    """
+    cursor.execute("""
+        UPDATE enrichment_jobs
+        SET status = 'failed',
+            error = COALESCE(error, 'Lease expired on the last attempt'),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'running' AND updated_at < datetime('now', ?) AND attempts >= ?
+        RETURNING question_id
+    """, (_lease_expiry(), config.ENRICH_MAX_ATTEMPTS))
+    question_ids = [row["question_id"] for row in cursor.fetchall()]
+
+    if question_ids:
+        cursor.execute("""
+            UPDATE questions SET status = 'failed'
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(question_ids),))
+    return len(question_ids)
+
+
+def job_status(cursor, question_id):
+    cursor.execute("""
+        SELECT q.id, q.status, q.auto_tags, q.rank_score, q.cluster_id,
+               j.attempts, j.error, j.result, j.updated_at
+        FROM questions q
+        LEFT JOIN enrichment_jobs j ON j.question_id = q.id
+        WHERE q.id = ?
+    """, (question_id,))
+    return cursor.fetchone()
+
+
+# =========================
+# WORKER POOL
+# =========================
+
+class EnrichmentPool:
+    """
+    Local worker threads draining enrichment_jobs. start() is idempotent
+    and per process: threads do not survive a fork, so each worker
+    process starts its own pool.
+    """
+
+    def __init__(self, num_workers=2, poll_seconds=1.0, on_ready=None):
+        self.num_workers = num_workers
+        self.poll_seconds = poll_seconds
+        self.on_ready = on_ready
+        self._wake = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"enrichment-{i}", daemon=True)
+                for i in range(self.num_workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def notify(self):
+        """
+        Wake an idle worker (jobs are picked up by polling otherwise)
+        """
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                print(f"⚠️  Enrichment worker error: {e}")
+                worked = False
+
+            if not worked:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def run_once(self):
+        """
+        Claim and process one job. Returns False when the queue is empty.
+        """
+        db = get_db()
+        cursor = db.cursor()
+        abandoned = fail_abandoned_jobs(cursor)
+        job = claim_job(cursor)
+        db.commit()
+        db.close()
+
+        if abandoned:
+            print(f"⚠️  {abandoned} enrichment job(s) failed: lease expired on the last attempt")
+            with self._stats_lock:
+                self.failed += abandoned
+
+        if job is None:
+            return False
+
+        try:
+            self._enrich(job)
+        except Exception as e:
+            self._record_failure(job, e)
+        return True
+
+    def _enrich(self, job):
+        from model_utils import process_new_question
+
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute("SELECT question_text FROM questions WHERE id = ?", (job["question_id"],))
+        question = cursor.fetchone()
+        db.close()
+
+        if question is None:
+            raise LookupError(f"Question {job['question_id']} no longer exists")
+
+        nlp_result = process_new_question(question["question_text"])
+
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute("""
+            UPDATE questions
+            SET auto_tags = ?, rank_score = ?, cluster_id = ?, embedding = ?, status = 'ready'
+            WHERE id = ?
+        """, (
+            ",".join(nlp_result["auto_tags"]),
+            nlp_result["rank_score"],
+            nlp_result["cluster_id"],
+            to_blob(nlp_result["embedding"]),
+            job["question_id"]
+        ))
+        set_question_tags(cursor, job["question_id"], nlp_result["auto_tags"])
+        cursor.execute("""
+            UPDATE enrichment_jobs
+            SET status = 'done', error = NULL, result = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (json.dumps({"similar_questions": nlp_result["similar_questions"]}), job["id"]))
+        db.commit()
+        db.close()
+
+        question_store.add(job["question_id"], nlp_result["embedding"])
+        with self._stats_lock:
+            self.completed += 1
+        if self.on_ready:
+            self.on_ready(job["question_id"])
+
+    def _record_failure(self, job, error):
+        final = job["attempts"] >= config.ENRICH_MAX_ATTEMPTS
+        print(f"⚠️  Enrichment of question {job['question_id']} failed "
+              f"(attempt {job['attempts']}): {error}")
+        if final:
+            traceback.print_exc()
+
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute("""
+            UPDATE enrichment_jobs
+            SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, ("failed" if final else "queued", str(error), job["id"]))
+        if final:
+            cursor.execute("""
+                UPDATE questions SET status = 'failed' WHERE id = ?
+            """, (job["question_id"],))
+        db.commit()
+        db.close()
+
+        with self._stats_lock:
+            if final:
+                self.failed += 1
+            else:
+                self.retried += 1
+
+    def stats(self):
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT status, COUNT(*) AS n FROM enrichment_jobs GROUP BY status
+        """)
+        jobs = {row["status"]: row["n"] for row in cursor.fetchall()}
+        db.close()
+
+        with self._stats_lock:
+            return {
+                "running": self._pid == os.getpid(),
+                "workers": self.num_workers,
+                "completed": self.completed,
+                "failed": self.failed,
+                "retried": self.retried,
+                "jobs": jobs
+            }
+
+
+enrichment_pool = EnrichmentPool(
+    num_workers=config.ENRICH_WORKERS,
+    poll_seconds=config.ENRICH_POLL_SECONDS
+)
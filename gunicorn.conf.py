@@ -0,0 +1,35 @@
+"""
+Multi-worker deployment: one preloaded master, forked workers (see preload.py).
+
+    gunicorn -c gunicorn.conf.py app:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi_app:app
+"""
+
+import os
+
+# The master warms up in on_starting; the workers inherit the loaded
+# components and must not start warm-up threads of their own
+os.environ["QA_WARMUP_MODE"] = "lazy"
+
+import config
+import preload
+
+bind = config.SERVE_BIND
+workers = config.SERVE_WORKERS
+threads = config.SERVE_THREADS
+worker_class = "gthread"
+preload_app = True
+
+
+def on_starting(server):
+    preload.preload()
+
+
+def post_worker_init(worker):
+    import services
+
+    services.start_background_workers()
+    if not services.response_cache.shared_across_workers():
+        print(f"⚠️  Worker {worker.pid}: response cache versions are not shared with the other "
+              f"workers (keep preload_app, or set QA_RESPONSE_CACHE_BACKEND=redis)")
+    preload.report_worker(worker.pid)
@@ -0,0 +1,218 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+    qa_stage_seconds{stage}                      model_utils pipeline stages
+    qa_http_request_duration_seconds{method,route,status}
+    qa_http_requests_total / qa_http_request_errors_total
+    qa_db_connection_seconds                     time a pooled connection is checked out
+
+Cache, scheduler and enrichment counters are read from their stats()
+when /metrics is scraped, so they cost nothing per request.
+
+Recording is one perf_counter pair and a locked increment. With
+QA_METRICS=0 every timer is a shared no-op. Metrics are per process:
+behind several workers, each scrape reports the worker that served it.
+"""
+
+import bisect
+import threading
+import time
+
+import config
+
+ENABLED = config.METRICS_ENABLED
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+# =========================
+# METRIC TYPES
+# =========================
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels) if ENABLED else _NOOP
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket" + _format_labels(self.labelnames, labels, ("le", le)), cumulative
+            yield self.name + "_sum" + _format_labels(self.labelnames, labels), total
+            yield self.name + "_count" + _format_labels(self.labelnames, labels), cumulative
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+# =========================
+# REGISTRY
+# =========================
+
+_metrics = []
+_collectors = []
+
+
+def register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """
+    collect() -> [(name, type, help, [(labels dict, value), ...]), ...],
+    called at scrape time
+    """
+    _collectors.append(collect)
+
+
+def render():
+    """
+    Every metric in the Prometheus text exposition format (version 0.0.4)
+    """
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(f"{name} {value}" for name, value in metric.samples())
+
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            lines.append(f"# collector {getattr(collect, '__name__', collect)} failed: {e}")
+            continue
+        for name, metric_type, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# =========================
+# METRICS
+# =========================
+
+STAGE_SECONDS = register(Histogram(
+    "qa_stage_seconds", "Time spent in each NLP pipeline stage", ("stage",)
+))
+REQUEST_SECONDS = register(Histogram(
+    "qa_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+))
+REQUESTS = register(Counter(
+    "qa_http_requests_total", "HTTP requests", ("method", "route", "status")
+))
+REQUEST_ERRORS = register(Counter(
+    "qa_http_request_errors_total", "HTTP requests answered with a 5xx status", ("method", "route")
+))
+DB_SECONDS = register(Histogram(
+    "qa_db_connection_seconds", "Time a pooled SQLite connection is checked out"
+))
+
+
+def stage(name):
+    """
+    with stage("encode_batch"): ...  -> qa_stage_seconds{stage="encode_batch"}
+    """
+    return STAGE_SECONDS.time(name)
+
+
+def observe_request(method, route, status, seconds):
+    if not ENABLED:
+        return
+    status = str(status)
+    REQUEST_SECONDS.observe(seconds, method, route, status)
+    REQUESTS.inc(method, route, status)
+    if status.startswith("5"):
+        REQUEST_ERRORS.inc(method, route)
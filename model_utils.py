@@ -1,36 +1,438 @@
 import numpy as np
-import pandas as pd
-import re
-from sentence_transformers import SentenceTransformer, util
-from keybert import KeyBERT
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import config
+from ann_index import load_index
+from corpus_embeddings import load_embeddings
+from corpus_store import load_corpus, split_tags
+from embedding_cache import EmbeddingCache
+from metrics import stage
+from ranking import calculate_advanced_rank_score
+from tag_matcher import TagMatcher, load_tag_dictionary
 
 # =========================
-# LOAD NLP DATA (YOUR DATA)
+# LAZY LOADING
 # =========================
 
-# Load processed & ranked dataset
-df = pd.read_csv(
-    "D:/Projects/nlp_qa_platform/data/processed/final_dataset_ranked.csv",
-    encoding="latin1",
-    low_memory=False
-)
+# Each component is loaded on first use (or by warm_up) and timed, so
+# importing this module is cheap and readiness can be reported per component.
+
+_components = {}
+_load_lock = threading.RLock()
+
+load_timings = {}
+warmup_state = {
+    "ready": False,
+    "started_at": None,
+    "finished_at": None,
+    "error": None
+}
+_warm_up_pid = None
+_warm_up_lock = threading.Lock()
+
+# Requests cannot be served without these; tagging falls back to the
+# rule-based matcher and clusters to none
+REQUIRED_COMPONENTS = ("corpus", "corpus_index", "sbert_model")
+_required_loader_pid = None
+
+
+def _load_component(name, loader):
+    component = _components.get(name)
+    if component is not None:
+        return component
+
+    with _load_lock:
+        if name not in _components:
+            start = time.perf_counter()
+            _components[name] = loader()
+            load_timings[name] = round(time.perf_counter() - start, 4)
+    return _components[name]
+
+
+def use_components(**components):
+    """
+    Install already built components (e.g. a stand-in encoder and a
+    synthetic corpus for benchmarks) in place of the configured ones
+    """
+    with _load_lock:
+        _components.update(components)
+
+
+def _load_sbert_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(config.SBERT_MODEL_NAME)
+
+
+def _load_kw_model():
+    from keybert import KeyBERT
+    return KeyBERT(model=get_sbert_model())
+
+
+def get_corpus():
+    """
+    Processed & ranked dataset (served columns only, memory-mapped if packed)
+    """
+    return _load_component("corpus", load_corpus)
+
+
+def get_embeddings():
+    """
+    SBERT corpus embeddings (float32 / float16 / int8, optionally memory-mapped)
+    """
+    return _load_component("embeddings", load_embeddings)
+
+
+def get_corpus_index():
+    """
+    Similarity search index (exact or ANN, see config.SEARCH_BACKEND)
+    """
+    return _load_component("corpus_index", lambda: load_index(get_embeddings))
+
+
+def get_sbert_model():
+    return _load_component("sbert_model", _load_sbert_model)
+
+
+def get_kw_model():
+    return _load_component("kw_model", _load_kw_model)
+
+
+def _load_tag_matcher():
+    dictionary = COMMON_TAGS
+    if config.TAG_DICTIONARY_PATH:
+        dictionary = load_tag_dictionary(config.TAG_DICTIONARY_PATH)
+    return TagMatcher(dictionary)
+
+
+def get_tag_matcher():
+    """
+    Compiled rule-based matcher over COMMON_TAGS or config.TAG_DICTIONARY_PATH
+    """
+    return _load_component("tag_matcher", _load_tag_matcher)
+
+
+def _load_tag_engine():
+    from tag_engine import VocabTagEngine
+
+    if not VocabTagEngine.exists():
+        print("⚠️  Tag vocabulary not built (run: python tag_engine.py build), using KeyBERT")
+        return False
+    return VocabTagEngine.load()
+
+
+def _load_cluster_model():
+    from clustering import ClusterModel
 
-# Load SBERT embeddings
-embeddings = np.load(
-    "D:/Projects/nlp_qa_platform/data/embeddings/question_embeddings.npy"
+    if not ClusterModel.exists():
+        print("⚠️  Cluster centroids not built (run: python clustering.py fit), "
+              "questions are stored without a cluster")
+        return False
+    return ClusterModel.load()
+
+
+def get_cluster_model():
+    """
+    Nearest-centroid cluster assignment, or None when not built
+    """
+    return _load_component("cluster_model", _load_cluster_model) or None
+
+
+def assign_cluster(embedding):
+    cluster_model = get_cluster_model()
+    if cluster_model is None:
+        return None
+    return cluster_model.assign(embedding)
+
+
+def get_tag_engine(force=False):
+    """
+    The vocab tag engine, or None when tagging uses KeyBERT
+    """
+    if config.TAG_ENGINE != "vocab" and not force:
+        return None
+    return _load_component("tag_engine", _load_tag_engine) or None
+
+
+# Query embeddings, keyed on normalized question text
+embedding_cache = EmbeddingCache(
+    max_size=config.EMBEDDING_CACHE_SIZE,
+    ttl_seconds=config.EMBEDDING_CACHE_TTL
 )
 
+
+def warm_up():
+    """
+    Load every component, then run a dummy encode, index search and
+    keyword extraction so the first real request doesn't pay for lazy
+    initialization inside torch / the index.
+    """
+    warmup_state["started_at"] = time.time()
+    warmup_state["finished_at"] = None
+    warmup_state["error"] = None
+
+    try:
+        get_corpus()
+        # Loads the embedding matrix too, for exact search only
+        get_corpus_index()
+        get_sbert_model()
+        get_kw_model()
+        get_tag_engine()
+        get_tag_matcher()
+        get_cluster_model()
+
+        start = time.perf_counter()
+        query_embedding = get_sbert_model().encode("warm up query")
+        top_indices, _ = get_corpus_index().search(query_embedding, 1)
+        get_corpus().payloads.hits(top_indices)
+        extract_keywords_improved("warm up query")
+        load_timings["warmup_inference"] = round(time.perf_counter() - start, 4)
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        raise
+    finally:
+        warmup_state["finished_at"] = time.time()
+
+    warmup_state["ready"] = True
+
+
+def start_warm_up(mode=None):
+    """
+    "eager": block until warm, "background": warm in a thread,
+    "lazy": load components on first use only. Runs once per process.
+    """
+    global _warm_up_pid
+
+    mode = mode or config.WARMUP_MODE
+    with _warm_up_lock:
+        if _warm_up_pid == os.getpid():
+            return
+        _warm_up_pid = os.getpid()
+
+    if mode == "eager":
+        warm_up()
+    elif mode == "background":
+        threading.Thread(target=_warm_up_quietly, name="warm-up", daemon=True).start()
+    elif mode != "lazy":
+        raise ValueError(f"Unknown warm-up mode: {mode}")
+
+
+def _warm_up_quietly():
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"⚠️  Warm-up failed: {e}")
+
+
+def _load_required_quietly():
+    try:
+        get_corpus()
+        get_corpus_index()
+        get_sbert_model()
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        print(f"⚠️  Loading required components failed: {e}")
+
+
+def _start_required_loader():
+    global _required_loader_pid
+
+    with _warm_up_lock:
+        if _required_loader_pid == os.getpid():
+            return
+        _required_loader_pid = os.getpid()
+    threading.Thread(target=_load_required_quietly, name="load-required", daemon=True).start()
+
+
+def _loaded(name):
+    """
+    Loaded and built: loaders of optional components store False when
+    their artifacts are missing
+    """
+    component = _components.get(name)
+    return component is not None and component is not False
+
+
+def readiness():
+    """
+    Ready once the required components are loaded and no warm-up is
+    still running. In "lazy" mode a readiness probe counts as a first
+    use: it starts loading the required components in the background,
+    so a worker behind a ready-only router does not wait for traffic
+    that never comes.
+    """
+    components = {name: _loaded(name) for name in (
+        "corpus", "embeddings", "corpus_index", "sbert_model", "kw_model",
+        "tag_engine", "tag_matcher", "cluster_model"
+    )}
+    warming = warmup_state["started_at"] is not None and warmup_state["finished_at"] is None
+    ready = all(_loaded(name) for name in REQUIRED_COMPONENTS) and not warming
+
+    if not ready and config.WARMUP_MODE == "lazy":
+        _start_required_loader()
+
+    return {
+        "ready": ready,
+        "warmed_up": warmup_state["ready"],
+        "error": warmup_state["error"],
+        "components": components,
+        "load_timings": dict(load_timings)
+    }
+
 # =========================
-# LOAD MODELS (ONCE)
+# MICRO-BATCHING SCHEDULER
 # =========================
 
-sbert_model = SentenceTransformer("all-MiniLM-L6-v2")
-kw_model = KeyBERT(model=sbert_model)
+class InferenceScheduler:
+    """
+    Collects single-sentence encode requests from concurrent request
+    threads and runs them through SBERT as one batch. A batch takes
+    whatever is queued when the worker is free and is flushed at once:
+    requests arriving during an encode form the next batch, so batches
+    grow with load and an uncontended request never waits. It only waits
+    (at most max_wait_ms) for callers that have entered encode() but not
+    yet queued their sentence, and never beyond max_batch_size.
+    """
+
+    def __init__(self, encode_batch, max_batch_size=32, max_wait_ms=5):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = None
+        self._pid = None
+        # encode() callers whose sentence is not yet collected into a batch
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.max_queue_depth = 0
+        self.batch_size_counts = {}
+
+    def _ensure_worker(self):
+        # The batching thread does not survive a fork; each process starts its own
+        if self._worker is None or self._pid != os.getpid():
+            with self._start_lock:
+                if self._worker is None or self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    self._pending = 0
+                    self._pid = os.getpid()
+                    self._worker = threading.Thread(
+                        target=self._run, name="sbert-scheduler", daemon=True
+                    )
+                    self._worker.start()
+
+    def encode(self, text):
+        """
+        Blocking: returns the embedding for one sentence
+        """
+        self._ensure_worker()
+        future = Future()
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((text, future))
+
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+
+            # Queue drained: flush unless a caller is about to enqueue
+            with self._pending_lock:
+                announced = self._pending > len(batch)
+            remaining = deadline - time.monotonic()
+            if not announced or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        with self._pending_lock:
+            self._pending -= len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+
+            try:
+                vectors = self.encode_batch(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            with self._stats_lock:
+                size = len(batch)
+                self.batches += 1
+                self.items += size
+                self.max_batch_seen = max(self.max_batch_seen, size)
+                self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size_seen": self.max_batch_seen,
+                "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000
+            }
+
+
+def _encode_batch(texts):
+    with stage("encode"):
+        return get_sbert_model().encode(texts, batch_size=config.ENCODE_BATCH_SIZE)
+
+
+inference_scheduler = InferenceScheduler(
+    _encode_batch,
+    max_batch_size=config.MICROBATCH_MAX_SIZE,
+    max_wait_ms=config.MICROBATCH_MAX_WAIT_MS
+)
+
+
+def _encode_one(text):
+    if config.MICROBATCH_ENABLED:
+        return inference_scheduler.encode(text)
+    with stage("encode"):
+        return get_sbert_model().encode(text)
+
 
 # =========================
 # COMMON PROGRAMMING TAGS (FOR BETTER CATEGORIZATION)
 # =========================
 
+# Default rule-based tag dictionary; a larger one can be loaded from
+# JSON via config.TAG_DICTIONARY_PATH (same {category: [synonyms]} shape)
+
 COMMON_TAGS = {
     "python": ["python", "py", "django", "flask", "async", "asyncio"],
     "javascript": ["javascript", "js", "nodejs", "node.js", "react", "vue", "angular"],
@@ -55,18 +457,52 @@ def parse_tags(tag_str):
     Extract tags from string like:
     ['python' 'pandas' 'csv']
     """
-    if pd.isna(tag_str):
-        return []
-    return re.findall(r"'([^']+)'", tag_str)
+    return split_tags(tag_str)
+
+
+def encode_query(text):
+    """
+    SBERT embedding of a user question, served from the cache when possible
+    """
+    # Includes cache lookups and micro-batch queueing, unlike "encode"
+    with stage("encode_query"):
+        return embedding_cache.get_or_compute(text, _encode_one)
 
 
-def extract_keywords_improved(text, top_n=8):
+def encode_queries(texts):
     """
-    Improved keyword extraction with multiple strategies
+    Embeddings for a list of questions: cache hits are reused and all
+    misses go through one batched SBERT forward pass
     """
+    embeddings = [embedding_cache.get(text) for text in texts]
+    missing = [i for i, emb in enumerate(embeddings) if emb is None]
+
+    if missing:
+        encoded = _encode_batch([texts[i] for i in missing])
+        for i, emb in zip(missing, encoded):
+            embedding_cache.put(texts[i], emb)
+            embeddings[i] = emb
+
+    return np.stack(embeddings)
+
+
+def extract_keywords_improved(text, top_n=8, embedding=None, engine=None):
+    """
+    Improved keyword extraction with multiple strategies.
+    With the "vocab" engine, tags come from the question embedding
+    (computed here if not passed in) instead of KeyBERT.
+    """
+    tag_engine = _select_tag_engine(engine)
+
+    if tag_engine is not None:
+        if embedding is None:
+            embedding = encode_query(text)
+        tags = [tag for tag, _ in tag_engine.tags_for(embedding, top_n=top_n)]
+        return _merge_tags(text, tags, top_n)
+
     # Try KeyBERT extraction
     try:
-        keywords = kw_model.extract_keywords(
+        keywords = get_kw_model().extract_keywords(
             text,
             top_n=top_n,
             stop_words="english",
@@ -75,47 +511,65 @@ def extract_keywords_improved(text, top_n=8):
         tags = [kw[0].lower() for kw in keywords if kw[1] > 0.3]
     except:
         tags = []
-    
-    # Add manual pattern matching for common programming concepts
-    text_lower = text.lower()
-    for category, patterns in COMMON_TAGS.items():
-        for pattern in patterns:
-            if pattern in text_lower:
-                if category not in tags:
-                    tags.append(category)
-                break
-    
-    # Remove duplicates and limit to top_n
-    return list(dict.fromkeys(tags))[:top_n]
+
+    return _merge_tags(text, tags, top_n)
 
 
-def calculate_advanced_rank_score(
-    similarity_score,
-    answer_count=0,
-    view_count=0,
-    tag_relevance=0.5
-):
+def extract_keywords_batch(texts, top_n=8, embeddings=None, engine=None):
     """
-    Calculate rank score with multiple parameters:
-    - Semantic similarity (40%)
-    - Tag relevance (30%)
-    - Answer count (15%)
-    - Recency/popularity (15%)
+    extract_keywords_improved for a list of texts; KeyBERT embeds all
+    documents and candidates in one batched pass
     """
-    
-    # Normalize values
-    answer_score = min(answer_count / 10, 1.0) * 0.15  # Up to 10 answers
-    popularity_score = min(view_count / 100, 1.0) * 0.15  # Up to 100 views
-    
-    # Combined score
-    final_score = (
-        similarity_score * 0.40 +
-        tag_relevance * 0.30 +
-        answer_score +
-        popularity_score
-    )
-    
-    return min(final_score, 1.0)  # Cap at 1.0
+    tag_engine = _select_tag_engine(engine)
+
+    if tag_engine is not None:
+        if embeddings is None:
+            embeddings = encode_queries(texts)
+        all_tags = [
+            [tag for tag, _ in tags]
+            for tags in tag_engine.tags_for_batch(embeddings, top_n=top_n)
+        ]
+        return [_merge_tags(text, tags, top_n) for text, tags in zip(texts, all_tags)]
+
+    try:
+        keywords = get_kw_model().extract_keywords(
+            texts,
+            top_n=top_n,
+            stop_words="english",
+            language="english"
+        )
+        # KeyBERT unwraps the result when given a single document
+        if len(texts) == 1:
+            keywords = [keywords]
+    except:
+        keywords = [[] for _ in texts]
+
+    return [
+        _merge_tags(text, [kw[0].lower() for kw in kws if kw[1] > 0.3], top_n)
+        for text, kws in zip(texts, keywords)
+    ]
+
+
+def _select_tag_engine(engine):
+    """
+    None means KeyBERT; engine overrides config.TAG_ENGINE
+    """
+    if engine == "keybert":
+        return None
+    return get_tag_engine(force=(engine == "vocab"))
+
+
+def _merge_tags(text, tags, top_n):
+    """
+    Model tags plus rule-based programming categories
+    """
+    tags = list(tags)
+
+    # Add manual pattern matching for common programming concepts
+    tags.extend(get_tag_matcher().match(text))
+
+    # Remove duplicates and limit to top_n
+    return list(dict.fromkeys(tags))[:top_n]
 
 
 # =========================
@@ -126,23 +580,15 @@ def analyze_question(user_question, top_k=5):
     """
     Used for searching similar questions with improved tagging
     """
-    query_embedding = sbert_model.encode(user_question)
-
-    scores = util.cos_sim(query_embedding, embeddings)[0]
-    top_indices = scores.argsort(descending=True)[:top_k]
+    query_embedding = encode_query(user_question)
 
-    results = []
-    for idx in top_indices:
-        row = df.iloc[int(idx)]
-        results.append({
-            "question": row["Processed_Text"][:200],
-            "similarity": float(scores[idx]),
-            "rank_score": float(row["final_rank_score"]),
-            "tags": parse_tags(row["Tags_List"])
-        })
+    with stage("corpus_search"):
+        top_indices, top_scores = get_corpus_index().search(query_embedding, top_k)
+    results = _search_results(top_indices, top_scores)
 
     # Use improved keyword extraction
-    auto_tags = extract_keywords_improved(user_question, top_n=8)
+    with stage("tagging"):
+        auto_tags = extract_keywords_improved(user_question, top_n=8, embedding=query_embedding)
 
     return {
         "auto_tags": auto_tags,
@@ -150,6 +596,45 @@ def analyze_question(user_question, top_k=5):
     }
 
 
+def analyze_questions(user_questions, top_k=5):
+    """
+    Batch version of analyze_question: one encode, one matrix-matrix
+    similarity with per-row top-k, one KeyBERT call. Results keep input order.
+    """
+    query_embeddings = encode_queries(user_questions)
+
+    with stage("corpus_search_batch"):
+        top_indices, top_scores = get_corpus_index().search_batch(query_embeddings, top_k)
+    with stage("tagging_batch"):
+        all_tags = extract_keywords_batch(user_questions, top_n=8, embeddings=query_embeddings)
+
+    return [
+        {
+            "auto_tags": auto_tags,
+            "similar_questions": _search_results(indices, scores)
+        }
+        for auto_tags, indices, scores in zip(all_tags, top_indices, top_scores)
+    ]
+
+
+def _search_results(top_indices, top_scores):
+    # Padding from an ANN batch search that found fewer than top_k rows
+    found = np.asarray(top_indices) >= 0
+    top_indices, top_scores = np.asarray(top_indices)[found], np.asarray(top_scores)[found]
+
+    with stage("corpus_rows"):
+        hits = get_corpus().payloads.hits(top_indices)
+        return [
+            {
+                "question": snippet,
+                "similarity": similarity,
+                "rank_score": rank_score,
+                "tags": tags
+            }
+            for (snippet, rank_score, tags), similarity in zip(hits, top_scores.tolist())
+        ]
+
+
 # =========================
 # PROCESS NEW QUESTION
 # (USED WHEN USER ASKS)
@@ -160,30 +645,30 @@ def process_new_question(question_text):
     Called when a user posts a new question
     with improved tagging and ranking
     """
-    query_embedding = sbert_model.encode(question_text)
+    query_embedding = encode_query(question_text)
 
-    scores = util.cos_sim(query_embedding, embeddings)[0]
-    top_indices = scores.argsort(descending=True)[:5]
+    with stage("corpus_search"):
+        top_indices, top_scores = get_corpus_index().search(query_embedding, 5)
 
     similar_questions = []
     tag_frequency = {}
     
-    for idx in top_indices:
-        row = df.iloc[int(idx)]
-        tags = parse_tags(row["Tags_List"])
-        
-        # Count tag frequency to calculate tag relevance
-        for tag in tags:
-            tag_frequency[tag] = tag_frequency.get(tag, 0) + 1
-        
-        similar_questions.append({
-            "question": row["Processed_Text"][:200],
-            "similarity": float(scores[idx]),
-            "tags": tags
-        })
+    with stage("corpus_rows"):
+        hits = get_corpus().payloads.hits(top_indices)
+        for (snippet, _, tags), similarity in zip(hits, np.asarray(top_scores).tolist()):
+            # Count tag frequency to calculate tag relevance
+            for tag in tags:
+                tag_frequency[tag] = tag_frequency.get(tag, 0) + 1
+
+            similar_questions.append({
+                "question": snippet,
+                "similarity": similarity,
+                "tags": tags
+            })
 
     # Use improved keyword extraction
-    auto_tags = extract_keywords_improved(question_text, top_n=8)
+    with stage("tagging"):
+        auto_tags = extract_keywords_improved(question_text, top_n=8, embedding=query_embedding)
     
     # Calculate tag relevance score based on how many similar questions have these tags
     tag_relevance = 0.5
@@ -192,7 +677,7 @@ def process_new_question(question_text):
         tag_relevance = 0.5 + (matches / len(auto_tags)) * 0.5
 
     # Use advanced ranking with multiple parameters
-    base_similarity = float(scores[top_indices[0]]) if len(top_indices) > 0 else 0.0
+    base_similarity = float(top_scores[0]) if len(top_scores) > 0 else 0.0
     rank_score = calculate_advanced_rank_score(
         similarity_score=base_similarity,
         answer_count=2,  # Will be updated when answers are posted
@@ -203,5 +688,7 @@ def process_new_question(question_text):
     return {
         "auto_tags": auto_tags,
         "similar_questions": similar_questions,
-        "rank_score": min(rank_score, 1.0)
+        "rank_score": min(rank_score, 1.0),
+        "cluster_id": assign_cluster(query_embedding),
+        "embedding": query_embedding
     }
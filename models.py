@@ -1,9 +1,52 @@
-from database import get_db
+import argparse
+import hashlib
+import os
+import threading
 
-def init_db():
-    db = get_db()
+from database import DB_NAME, get_db
+from ranking import rank_score_sql
+
+
+def add_column_if_missing(cursor, table, column, definition):
+    """
+    Lightweight migration for databases created before a column existed
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [row["name"] for row in cursor.fetchall()]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+    return False
+
+
+# Databases init_db has run on in this process, or in the preloaded master
+# it was forked from (see preload.py)
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def init_db_once(path=None):
+    """
+    init_db, skipped when this process or its master already ran it
+    """
+    key = os.path.abspath(path or DB_NAME)
+    with _init_lock:
+        if key not in _initialized:
+            init_db(path)
+
+
+def init_db(path=None):
+    db = get_db(path)
     cursor = db.cursor()
 
+    # The whole migration is one write transaction: another process
+    # running init_db waits for it and then finds nothing left to do, and
+    # no write can land between a trigger's DROP and its CREATE
+    cursor.execute("BEGIN IMMEDIATE")
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing_tables = {row["name"] for row in cursor.fetchall()}
+
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS questions (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -12,10 +55,40 @@ def init_db():
         cluster_id INTEGER,
         rank_score REAL,
         user_id INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        embedding BLOB,
+        answer_count INTEGER NOT NULL DEFAULT 0,
+        view_count INTEGER NOT NULL DEFAULT 0,
+        feed_score REAL,
+        status TEXT NOT NULL DEFAULT 'ready'
     )
     """)
 
+    # SBERT embedding (float32 bytes), see question_embeddings.py
+    add_column_if_missing(cursor, "questions", "embedding", "BLOB")
+
+    # Materialized ranking inputs and result, kept current by triggers
+    needs_rebuild = add_column_if_missing(
+        cursor, "questions", "answer_count", "INTEGER NOT NULL DEFAULT 0"
+    )
+    add_column_if_missing(cursor, "questions", "view_count", "INTEGER NOT NULL DEFAULT 0")
+    needs_rebuild |= add_column_if_missing(cursor, "questions", "feed_score", "REAL")
+
+    # "pending" until background enrichment has run (see enrichment.py)
+    add_column_if_missing(cursor, "questions", "status", "TEXT NOT NULL DEFAULT 'ready'")
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_questions_feed
+    ON questions (feed_score, id)
+    """)
+
+    # /clusters/<id>/questions: one cluster in feed order. The index seeks
+    # and orders the page; the selected columns are read from the table
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_questions_cluster
+    ON questions (cluster_id, feed_score, id)
+    """)
+
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS answers (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -27,6 +100,45 @@ def init_db():
     )
     """)
 
+    # Normalized tags (one row per question/tag) for SQL-side filtering
+    needs_tag_migration = (
+        "questions" in existing_tables and "question_tags" not in existing_tables
+    )
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS question_tags (
+        question_id INTEGER NOT NULL,
+        tag TEXT NOT NULL,
+        PRIMARY KEY(question_id, tag),
+        FOREIGN KEY(question_id) REFERENCES questions(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_question_tags_tag
+    ON question_tags (tag, question_id)
+    """)
+
+    # Background NLP for questions accepted with QA_ASK_MODE=async
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS enrichment_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_id INTEGER NOT NULL UNIQUE,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        result TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(question_id) REFERENCES questions(id) ON DELETE CASCADE
+    )
+    """)
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_status
+    ON enrichment_jobs (status, id)
+    """)
+
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -49,5 +161,196 @@ def init_db():
     )
     """)
 
+    # Every write of questions.embedding, so each process's in-memory
+    # matrix can follow rows re-encoded after insert (see question_embeddings.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS embedding_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_id INTEGER NOT NULL
+    )
+    """)
+
+    # Version of each trigger group, see create_triggers
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """)
+
+    create_ranking_triggers(cursor)
+    create_embedding_triggers(cursor)
+
+    db.commit()
+    db.close()
+
+    if needs_rebuild:
+        rebuild_rankings(path)
+    if needs_tag_migration:
+        rebuild_question_tags(path)
+
+    _initialized.add(os.path.abspath(path or DB_NAME))
+
+
+def normalize_tags(tags):
+    """
+    Lower-cased, stripped, de-duplicated tags (order kept).
+    Accepts a list or the comma-joined auto_tags string.
+    """
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return list(dict.fromkeys(
+        tag.strip().lower() for tag in tags if tag and tag.strip()
+    ))
+
+
+def set_question_tags(cursor, question_id, tags):
+    """
+    Replace the question_tags rows of one question
+    """
+    cursor.execute("DELETE FROM question_tags WHERE question_id = ?", (question_id,))
+    cursor.executemany("""
+        INSERT INTO question_tags (question_id, tag) VALUES (?, ?)
+    """, [(question_id, tag) for tag in normalize_tags(tags)])
+
+
+def create_triggers(cursor, group, triggers):
+    """
+    Create a group of triggers (name -> definition after the name). The
+    group's SQL is hashed into schema_meta; triggers are only dropped and
+    re-created when it changed, e.g. new weights in ranking.py.
+    """
+    version = hashlib.sha1(
+        "".join(name + sql for name, sql in sorted(triggers.items())).encode("utf-8")
+    ).hexdigest()
+
+    cursor.execute("SELECT value FROM schema_meta WHERE key = ?", (f"triggers:{group}",))
+    row = cursor.fetchone()
+    stale = row is None or row["value"] != version
+
+    for name, sql in triggers.items():
+        if stale:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {sql}")
+
+    if stale:
+        cursor.execute("""
+            INSERT INTO schema_meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        """, (f"triggers:{group}", version))
+
+
+def create_ranking_triggers(cursor):
+    """
+    answer_count follows inserts/deletes on answers, and feed_score is
+    recomputed whenever one of its inputs changes, with the weights in
+    ranking.py.
+    """
+    feed_score = rank_score_sql("NEW.rank_score", "NEW.answer_count", "NEW.view_count")
+
+    create_triggers(cursor, "ranking", {
+        "answers_count_insert": """
+        AFTER INSERT ON answers
+        BEGIN
+            UPDATE questions SET answer_count = answer_count + 1
+            WHERE id = NEW.question_id;
+        END""",
+
+        "answers_count_delete": """
+        AFTER DELETE ON answers
+        BEGIN
+            UPDATE questions SET answer_count = answer_count - 1
+            WHERE id = OLD.question_id;
+        END""",
+
+        "questions_feed_score_insert": f"""
+        AFTER INSERT ON questions
+        BEGIN
+            UPDATE questions SET feed_score = {feed_score}
+            WHERE id = NEW.id;
+        END""",
+
+        "questions_feed_score_update": f"""
+        AFTER UPDATE OF rank_score, answer_count, view_count ON questions
+        BEGIN
+            UPDATE questions SET feed_score = {feed_score}
+            WHERE id = NEW.id;
+        END""",
+    })
+
+
+def create_embedding_triggers(cursor):
+    """
+    Log inserted and updated embeddings in embedding_changes
+    """
+    create_triggers(cursor, "embedding", {
+        "questions_embedding_insert": """
+        AFTER INSERT ON questions
+        WHEN NEW.embedding IS NOT NULL
+        BEGIN
+            INSERT INTO embedding_changes (question_id) VALUES (NEW.id);
+        END""",
+
+        "questions_embedding_update": """
+        AFTER UPDATE OF embedding ON questions
+        WHEN NEW.embedding IS NOT NULL
+        BEGIN
+            INSERT INTO embedding_changes (question_id) VALUES (NEW.id);
+        END""",
+    })
+
+
+def rebuild_rankings(path=None):
+    """
+    One-off recount of answers and recompute of feed_score for every question
+    """
+    db = get_db(path)
+    cursor = db.cursor()
+
+    # Setting answer_count fires questions_feed_score_update for each row
+    cursor.execute("""
+        UPDATE questions
+        SET answer_count = (
+            SELECT COUNT(*) FROM answers a WHERE a.question_id = questions.id
+        )
+    """)
+    updated = cursor.rowcount
+
     db.commit()
     db.close()
+    print(f"✅ Rebuilt rankings for {updated} questions")
+
+
+def rebuild_question_tags(path=None):
+    """
+    One-off migration: fill question_tags from the auto_tags column
+    """
+    db = get_db(path)
+    cursor = db.cursor()
+
+    cursor.execute("DELETE FROM question_tags")
+    cursor.execute("SELECT id, auto_tags FROM questions WHERE auto_tags IS NOT NULL")
+    rows = cursor.fetchall()
+
+    cursor.executemany("""
+        INSERT INTO question_tags (question_id, tag) VALUES (?, ?)
+    """, [(row["id"], tag) for row in rows for tag in normalize_tags(row["auto_tags"])])
+
+    db.commit()
+    db.close()
+    print(f"✅ Rebuilt tags for {len(rows)} questions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Database schema management")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="Create or migrate tables")
+    sub.add_parser("rebuild-rankings", help="Recount answers and recompute feed scores")
+    sub.add_parser("rebuild-tags", help="Refill question_tags from auto_tags")
+
+    args = parser.parse_args()
+    init_db()
+    if args.command == "rebuild-rankings":
+        rebuild_rankings()
+    elif args.command == "rebuild-tags":
+        rebuild_question_tags()
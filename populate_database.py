@@ -506,7 +506,7 @@ def populate_database():
     """Add 200 questions with answers to database"""
     
     # Initialize database first
-    from models import init_db
+    from models import init_db, set_question_tags
     init_db()
     
     import time
@@ -542,6 +542,8 @@ def populate_database():
             
             question_id = cursor.lastrowid
             question_count += 1
+
+            set_question_tags(cursor, question_id, q_data["tags"])
             
             # Insert answers
             for answer_text in q_data["answers"]:
@@ -0,0 +1,151 @@
+"""
+Preload / fork serving (Unix only).
+
+The master process loads the corpus, embeddings, search index and models
+once, then forks the workers. Before forking:
+- the embedding matrix (exact search) or the IVF arrays are copied into
+  anonymous shared memory, unless they are already memory-mapped from disk
+- the packed corpus is memory-mapped, so its pages live in the OS cache
+- the garbage collector is frozen, so collections in the workers do not
+  write to (and un-share) objects inherited from the master
+Each worker then only adds its private memory on top of the shared copy.
+
+    gunicorn -c gunicorn.conf.py app:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi_app:app
+"""
+
+import gc
+import mmap
+import resource
+import time
+
+import numpy as np
+
+import model_utils
+from ann_index import ExactIndex, IVFIndex
+from corpus_store import PackedCorpus
+from models import init_db
+
+boot_report = {}
+
+
+# =========================
+# MEMORY
+# =========================
+
+def memory_usage():
+    """
+    Resident memory of this process in MB. "private" is what the process
+    does not share with any other; "pss" splits shared pages between the
+    processes mapping them. Linux only, else RSS peak from getrusage.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {
+                line.split(":")[0]: int(line.split()[1])
+                for line in f if line.split()[-1] == "kB"
+            }
+    except OSError:
+        return {"rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "private_mb": round(private / 1024, 1)
+    }
+
+
+# =========================
+# SHARED MEMORY
+# =========================
+
+def to_shared(array):
+    """
+    Read-only copy of array in an anonymous shared mapping, inherited by
+    forked workers without copy-on-write. Memory-mapped arrays are already
+    shared through the page cache and are returned as is.
+    """
+    if array is None or isinstance(array, np.memmap) or array.nbytes == 0:
+        return array
+
+    buffer = mmap.mmap(-1, array.nbytes)
+    shared = np.frombuffer(buffer, dtype=array.dtype).reshape(array.shape)
+    shared[...] = array
+    shared.flags.writeable = False
+    return shared
+
+
+def share_corpus_arrays():
+    """
+    Move the embedding matrix (exact search) or the index vectors into
+    shared memory
+    """
+    index = model_utils.get_corpus_index()
+    if isinstance(index, ExactIndex):
+        index.vectors.data = to_shared(index.vectors.data)
+        index.vectors.scales = to_shared(index.vectors.scales)
+    elif isinstance(index, IVFIndex):
+        index.centroids = to_shared(index.centroids)
+        index.ids = to_shared(index.ids)
+        index.vectors = to_shared(index.vectors)
+
+    # Memory-mapped for a packed store with payload files, else built in RAM
+    payloads = model_utils.get_corpus().payloads
+    for name in ["blob", "snippet_starts", "snippet_stops", "tag_ids", "tag_offsets", "rank_scores"]:
+        setattr(payloads, name, to_shared(getattr(payloads, name)))
+
+    if not isinstance(model_utils.get_corpus(), PackedCorpus):
+        print("⚠️  Corpus loaded from CSV is not shared between workers "
+              "(run: python corpus_store.py build)")
+
+
+# =========================
+# MASTER / WORKER HOOKS
+# =========================
+
+def preload():
+    """
+    Migrate the schema and warm everything up in the master, share the
+    corpus arrays, freeze the GC
+    """
+    start = time.perf_counter()
+
+    # Once, before forking: workers skip it (init_db_once) instead of
+    # racing each other through the same ALTER/CREATE statements
+    init_db()
+
+    print("🚀 Preloading corpus, embeddings and models...")
+
+    model_utils.warm_up()
+    share_corpus_arrays()
+
+    # Creates the response cache backend here, so the memory backend's
+    # version counters are inherited by (and shared with) every worker
+    from services import response_cache
+    response_cache.backend
+
+    gc.collect()
+    gc.freeze()
+
+    boot_report.update({
+        "startup_s": round(time.perf_counter() - start, 2),
+        "load_timings": dict(model_utils.load_timings),
+        "master": memory_usage()
+    })
+    print(f"✅ Preloaded in {boot_report['startup_s']}s, master {boot_report['master']}")
+    return boot_report
+
+
+def report_worker(pid):
+    """
+    Memory a worker adds on top of what it shares with the master
+    """
+    usage = memory_usage()
+    master_rss = boot_report.get("master", {}).get("rss_mb")
+    delta = usage.get("private_mb")
+    if delta is None and master_rss is not None:
+        delta = round(usage["rss_mb"] - master_rss, 1)
+
+    print(f"  ✓ Worker {pid} ready: +{delta} MB private ({usage})")
+    return usage
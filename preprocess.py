@@ -0,0 +1,244 @@
+"""
+Streaming corpus preprocessing: StackSample CSVs -> sharded Parquet.
+
+Scripted version of the cleaning steps in 01_data_exploration.ipynb,
+which read the whole dump into memory, ran BeautifulSoup row by row with
+.apply and spaCy one document at a time with progress_apply.
+
+Questions.csv is streamed in chunks of --chunksize rows and each chunk
+becomes one shard:
+
+    <out>/part-00000.parquet   Id, Full_Text, Tags_List, CreationDate, Score, Processed_Text
+    <out>/manifest.json        input, chunk size and spaCy model the shards were cut with
+
+HTML is cleaned in a process pool, and all chunks flow through a single
+nlp.pipe(n_process=...) with the parser and NER disabled, so the spaCy
+workers load the model once for the whole run.
+
+Each shard is written to a temporary file and renamed, so an interrupted
+run leaves only complete shards; running the same command again skips
+them and picks up at the first missing one.
+
+    python preprocess.py run --input-dir <stacksample> --workers 8
+    python preprocess.py export --csv final_dataset.csv
+"""
+
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import pandas as pd
+
+import config
+
+QUESTION_COLUMNS = ["Id", "Title", "Body", "CreationDate", "Score"]
+OUTPUT_COLUMNS = ["Id", "Full_Text", "Tags_List", "CreationDate", "Score", "Processed_Text"]
+
+# Only the lemmatizer and its inputs (tagger, attribute_ruler) are needed
+SPACY_DISABLE = ["parser", "ner"]
+
+
+# =========================
+# TEXT CLEANING
+# =========================
+
+def clean_html(text):
+    from bs4 import BeautifulSoup
+
+    if pd.isna(text):
+        return ""
+    return BeautifulSoup(text, "html.parser").get_text()
+
+
+def clean_question(title_body):
+    """
+    (Title, Body) -> Full_Text; runs in the cleaning pool
+    """
+    title, body = title_body
+    return clean_html(title) + " " + clean_html(body)
+
+
+def preprocess_doc(doc):
+    """
+    Space-separated lemmas, without stopwords, punctuation, non-alphabetic
+    and very short tokens
+    """
+    return " ".join(
+        token.lemma_.lower()
+        for token in doc
+        if not token.is_stop and not token.is_punct and token.is_alpha and len(token.text) > 2
+    )
+
+
+# =========================
+# SHARDS
+# =========================
+
+def shard_path(out_dir, shard):
+    return os.path.join(out_dir, f"part-{shard:05d}.parquet")
+
+
+def write_shard(chunk, path):
+    tmp_path = path + ".tmp"
+    chunk[OUTPUT_COLUMNS].to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_shards(out_dir=None, columns=None):
+    """
+    Yield the shards of a preprocessed corpus as DataFrames, in order
+    """
+    out_dir = out_dir or config.PREPROCESS_DIR
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith("part-") and name.endswith(".parquet"):
+            yield pd.read_parquet(os.path.join(out_dir, name), columns=columns)
+
+
+def check_manifest(out_dir, manifest):
+    """
+    Shards can only be resumed with the settings they were cut with
+    """
+    path = os.path.join(out_dir, "manifest.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise SystemExit(
+                f"⚠️  {out_dir} holds shards built with {existing}, not {manifest}; "
+                f"use another --out to start over"
+            )
+        return
+
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+# =========================
+# PIPELINE
+# =========================
+
+def load_tag_lists(tags_path):
+    """
+    Question Id -> list of its tags
+    """
+    tags = pd.read_csv(tags_path, encoding="latin1", usecols=["Id", "Tag"], dtype={"Tag": str})
+    return tags.dropna().groupby("Id")["Tag"].apply(list)
+
+
+def run(input_dir=None, out_dir=None, workers=None, chunksize=100_000, batch_size=256,
+        spacy_model=None):
+    import spacy
+
+    input_dir = input_dir or config.RAW_DATASET_DIR
+    out_dir = out_dir or config.PREPROCESS_DIR
+    workers = workers or config.PREPROCESS_WORKERS
+    spacy_model = spacy_model or config.SPACY_MODEL
+    questions_path = os.path.join(input_dir, "Questions.csv")
+
+    os.makedirs(out_dir, exist_ok=True)
+    check_manifest(out_dir, {
+        "input": os.path.abspath(questions_path),
+        "chunksize": chunksize,
+        "spacy_model": spacy_model,
+        "columns": OUTPUT_COLUMNS
+    })
+
+    print(f"🚀 Preprocessing {questions_path} -> {out_dir} ({workers} workers)")
+    start = time.perf_counter()
+
+    tag_lists = load_tag_lists(os.path.join(input_dir, "Tags.csv"))
+    nlp = spacy.load(spacy_model, disable=SPACY_DISABLE)
+
+    reader = pd.read_csv(
+        questions_path,
+        encoding="latin1",
+        usecols=QUESTION_COLUMNS,
+        chunksize=chunksize
+    )
+
+    # shard -> (chunk, Processed_Text so far); chunks are cleaned ahead of
+    # spaCy, so a few can be in flight at once
+    pending = {}
+    progress = {"skipped": 0, "written": 0, "rows": 0}
+
+    def texts(pool):
+        for shard, chunk in enumerate(reader):
+            if os.path.exists(shard_path(out_dir, shard)):
+                progress["skipped"] += 1
+                continue
+
+            chunk = chunk.reset_index(drop=True)
+            chunk["Full_Text"] = list(pool.imap(
+                clean_question, zip(chunk["Title"], chunk["Body"]), chunksize=64
+            ))
+            chunk["Tags_List"] = [
+                tags if isinstance(tags, list) else []
+                for tags in chunk["Id"].map(tag_lists)
+            ]
+            pending[shard] = (chunk, [])
+
+            for text in chunk["Full_Text"]:
+                yield text, shard
+
+    with Pool(workers) as pool:
+        docs = nlp.pipe(texts(pool), as_tuples=True, n_process=workers, batch_size=batch_size)
+        for doc, shard in docs:
+            chunk, processed = pending[shard]
+            processed.append(preprocess_doc(doc))
+            if len(processed) < len(chunk):
+                continue
+
+            chunk["Processed_Text"] = processed
+            write_shard(chunk, shard_path(out_dir, shard))
+            del pending[shard]
+
+            progress["written"] += 1
+            progress["rows"] += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"  ✓ shard {shard} ({progress['rows']} rows, {progress['rows'] / elapsed:.0f} rows/s)")
+
+    print(f"✅ Wrote {progress['written']} shards, skipped {progress['skipped']} already done, "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def export(out_dir=None, csv_path=None):
+    """
+    Concatenate the shards into one CSV (the notebooks' final_dataset.csv)
+    """
+    out_dir = out_dir or config.PREPROCESS_DIR
+    csv_path = csv_path or os.path.join(config.DATA_DIR, "processed", "final_dataset.csv")
+
+    rows = 0
+    for i, shard in enumerate(read_shards(out_dir)):
+        shard.to_csv(csv_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        rows += len(shard)
+    print(f"✅ Exported {rows} rows to {csv_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess the StackSample dump into sharded Parquet")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = sub.add_parser("run", help="Clean and lemmatize Questions.csv (resumable)")
+    run_cmd.add_argument("--input-dir", default=config.RAW_DATASET_DIR)
+    run_cmd.add_argument("--out", default=config.PREPROCESS_DIR)
+    run_cmd.add_argument("--workers", type=int, default=config.PREPROCESS_WORKERS)
+    run_cmd.add_argument("--chunksize", type=int, default=100_000, help="Rows per shard")
+    run_cmd.add_argument("--batch-size", type=int, default=256, help="spaCy nlp.pipe batch size")
+    run_cmd.add_argument("--spacy-model", default=config.SPACY_MODEL)
+
+    export_cmd = sub.add_parser("export", help="Concatenate the shards into one CSV")
+    export_cmd.add_argument("--out", default=config.PREPROCESS_DIR)
+    export_cmd.add_argument("--csv", default=os.path.join(config.DATA_DIR, "processed", "final_dataset.csv"))
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args.input_dir, args.out, args.workers, args.chunksize, args.batch_size, args.spacy_model)
+    elif args.command == "export":
+        export(args.out, args.csv)
+
+
+if __name__ == "__main__":
+    main()
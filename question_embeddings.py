@@ -0,0 +1,208 @@
+"""
+SBERT embeddings for locally posted questions.
+
+Embeddings are computed once when a question is posted, stored as a
+float32 BLOB on the questions row, and mirrored in an in-memory matrix
+so "similar questions" is a single matrix-vector product.
+
+Every write of questions.embedding is logged in embedding_changes (see
+models.py), which sync() follows to pick up rows from other workers.
+
+Backfill rows posted before embeddings were stored:
+    python question_embeddings.py backfill
+"""
+
+import argparse
+import threading
+
+import numpy as np
+
+import config
+from database import get_db
+
+
+# =========================
+# BLOB ENCODING
+# =========================
+
+def to_blob(embedding):
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def from_blob(blob):
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+# =========================
+# IN-MEMORY MATRIX
+# =========================
+
+class QuestionEmbeddingStore:
+    """
+    Normalized embeddings of local questions, keyed by question id.
+    Rows are appended in place; the buffer doubles when it fills up.
+    """
+
+    def __init__(self, initial_capacity=1024):
+        self._lock = threading.Lock()
+        self._capacity = initial_capacity
+        self._matrix = None
+        self._ids = np.empty(initial_capacity, dtype=np.int64)
+        self._row_of = {}
+        self._count = 0
+        # Last embedding_changes.seq applied; None until the first full load
+        self._seq = None
+
+    def __len__(self):
+        return self._count
+
+    def _append(self, question_id, embedding):
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+
+        if self._matrix is None:
+            self._matrix = np.empty((self._capacity, len(vector)), dtype=np.float32)
+        elif self._count == self._capacity:
+            self._capacity *= 2
+            self._matrix = np.resize(self._matrix, (self._capacity, self._matrix.shape[1]))
+            self._ids = np.resize(self._ids, self._capacity)
+
+        row = self._row_of.get(question_id)
+        if row is None:
+            row = self._count
+            self._count += 1
+            self._row_of[question_id] = row
+
+        self._matrix[row] = vector
+        self._ids[row] = question_id
+
+    def add(self, question_id, embedding):
+        with self._lock:
+            self._append(question_id, embedding)
+
+    def sync(self):
+        """
+        Pull in embeddings written since the last sync, by this or other
+        workers, including ones written later for older rows (async
+        enrichment, backfill). The first call loads every stored
+        embedding; later calls follow the embedding_changes log, so their
+        cost is proportional to the writes since.
+        """
+        db = get_db()
+        cursor = db.cursor()
+
+        if self._seq is None:
+            # Read the log position first: writes racing the full load are
+            # replayed by the next sync
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM embedding_changes")
+            seq = cursor.fetchone()["seq"]
+            cursor.execute("""
+                SELECT id, embedding
+                FROM questions
+                WHERE embedding IS NOT NULL
+                ORDER BY id
+            """)
+        else:
+            cursor.execute("""
+                SELECT COALESCE(MAX(seq), ?) AS seq FROM embedding_changes WHERE seq > ?
+            """, (self._seq, self._seq))
+            seq = cursor.fetchone()["seq"]
+            cursor.execute("""
+                SELECT q.id, q.embedding
+                FROM embedding_changes c
+                JOIN questions q ON q.id = c.question_id
+                WHERE c.seq > ? AND c.seq <= ? AND q.embedding IS NOT NULL
+                ORDER BY c.seq
+            """, (self._seq, seq))
+        rows = cursor.fetchall()
+        db.close()
+
+        with self._lock:
+            for row in rows:
+                self._append(row["id"], from_blob(row["embedding"]))
+            self._seq = seq
+
+    def get(self, question_id):
+        row = self._row_of.get(question_id)
+        if row is None:
+            return None
+        return self._matrix[row]
+
+    def similarities(self, question_id):
+        """
+        Cosine similarity of question_id against every other stored question.
+        Returns (question_ids, scores).
+        """
+        with self._lock:
+            target = self.get(question_id)
+            if target is None or self._count == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+            ids = self._ids[:self._count].copy()
+            scores = self._matrix[:self._count] @ target
+
+        others = ids != question_id
+        return ids[others], scores[others]
+
+
+question_store = QuestionEmbeddingStore()
+
+
+# =========================
+# BACKFILL
+# =========================
+
+def backfill(batch_size=64):
+    """
+    Encode and store embeddings for questions that don't have one yet
+    """
+    from sentence_transformers import SentenceTransformer
+    from models import init_db
+
+    init_db()
+    model = SentenceTransformer(config.SBERT_MODEL_NAME)
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT id, question_text
+        FROM questions
+        WHERE embedding IS NULL
+        ORDER BY id
+    """)
+    rows = cursor.fetchall()
+
+    print(f"🚀 Backfilling embeddings for {len(rows)} questions...")
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        vectors = model.encode(
+            [row["question_text"] for row in batch],
+            batch_size=batch_size
+        )
+        cursor.executemany("""
+            UPDATE questions SET embedding = ? WHERE id = ?
+        """, [(to_blob(v), row["id"]) for row, v in zip(batch, vectors)])
+        db.commit()
+        print(f"  ✓ {min(start + batch_size, len(rows))}/{len(rows)}")
+
+    db.close()
+    print("✅ Backfill complete")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage stored question embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fill = sub.add_parser("backfill", help="Embed questions that have no stored embedding")
+    fill.add_argument("--batch-size", type=int, default=64)
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        backfill(batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Ranking formula shared by the NLP layer (Python) and the database
+(SQL, for the materialized feed_score column).
+"""
+
+# =========================
+# WEIGHTS
+# =========================
+
+SIMILARITY_WEIGHT = 0.40
+TAG_WEIGHT = 0.30
+ANSWER_WEIGHT = 0.15
+POPULARITY_WEIGHT = 0.15
+
+MAX_ANSWERS = 10   # answer score saturates here
+MAX_VIEWS = 100    # popularity score saturates here
+
+# Tag relevance used for the general home feed
+FEED_TAG_RELEVANCE = 0.5
+
+
+def calculate_advanced_rank_score(
+    similarity_score,
+    answer_count=0,
+    view_count=0,
+    tag_relevance=0.5
+):
+    """
+    Calculate rank score with multiple parameters:
+    - Semantic similarity (40%)
+    - Tag relevance (30%)
+    - Answer count (15%)
+    - Recency/popularity (15%)
+    """
+    
+    # Normalize values
+    answer_score = min(answer_count / MAX_ANSWERS, 1.0) * ANSWER_WEIGHT
+    popularity_score = min(view_count / MAX_VIEWS, 1.0) * POPULARITY_WEIGHT
+    
+    # Combined score
+    final_score = (
+        similarity_score * SIMILARITY_WEIGHT +
+        tag_relevance * TAG_WEIGHT +
+        answer_score +
+        popularity_score
+    )
+    
+    return min(final_score, 1.0)  # Cap at 1.0
+
+
+def rank_score_sql(similarity, answer_count, view_count, tag_relevance=FEED_TAG_RELEVANCE):
+    """
+    calculate_advanced_rank_score as a SQLite expression over column names
+    """
+    return (
+        f"MIN("
+        f"COALESCE({similarity}, 0) * {SIMILARITY_WEIGHT} + "
+        f"{tag_relevance} * {TAG_WEIGHT} + "
+        f"MIN({answer_count} / {float(MAX_ANSWERS)}, 1.0) * {ANSWER_WEIGHT} + "
+        f"MIN({view_count} / {float(MAX_VIEWS)}, 1.0) * {POPULARITY_WEIGHT}"
+        f", 1.0)"
+    )
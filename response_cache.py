@@ -0,0 +1,268 @@
+"""
+Response cache for the feed and similar-question endpoints.
+
+Entries are keyed on the endpoint, its arguments and the current value of
+one or more version counters:
+- "global"        bumped by every new question or answer
+- "user:<id>"     bumped when that user's tag preferences change
+A write bumps the counter, so every key built from the old value stops
+matching and ages out through the size / TTL bounds; nothing is deleted
+eagerly. View counts also move feed_score but do not bump the version:
+the feed order may lag views by at most the TTL.
+
+The default backend keeps entries in-process, but its version counters
+live in shared memory: created in the preloaded master (preload.py) and
+inherited by the forked workers, so a write in one worker invalidates
+the entries cached by every other. Workers that are not forked from a
+preloading master (e.g. uvicorn --workers) do not share them and need
+QA_RESPONSE_CACHE_BACKEND=redis, where entries and versions live in Redis.
+"""
+
+import ctypes
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import config
+
+
+# =========================
+# BACKENDS
+# =========================
+
+class SharedVersions:
+    """
+    Version counters in an anonymous shared mapping, visible to every
+    process forked after creation. Scopes hash into a fixed number of
+    slots; two scopes sharing a slot only invalidate each other early.
+    """
+
+    def __init__(self, slots=4096):
+        self.slots = slots
+        self._counters = multiprocessing.Array(ctypes.c_int64, slots)
+        self.pid = os.getpid()
+
+    def _slot(self, scope):
+        return zlib.crc32(scope.encode("utf-8")) % self.slots
+
+    def get(self, scope):
+        return self._counters[self._slot(scope)]
+
+    def bump(self, scope):
+        with self._counters.get_lock():
+            self._counters[self._slot(scope)] += 1
+
+    def shared(self):
+        """
+        True in a process forked after the counters were created
+        """
+        return self.pid != os.getpid()
+
+
+class MemoryBackend:
+    """
+    Thread-safe LRU with a size bound and a per-entry TTL (one per
+    process); versions in SharedVersions
+    """
+
+    def __init__(self, max_size=2048, versions=None):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._versions = versions or SharedVersions()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def version(self, scope):
+        return self._versions.get(scope)
+
+    def bump(self, scope):
+        self._versions.bump(scope)
+
+    def shared(self):
+        return self._versions.shared()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class RedisBackend:
+    """
+    Entries and versions in Redis, shared by every worker. Values are
+    stored as JSON, so tuples come back as lists.
+    """
+
+    prefix = "qa:response:"
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl_seconds):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl_seconds)))
+
+    def version(self, scope):
+        return int(self.client.get(self.prefix + "version:" + scope) or 0)
+
+    def bump(self, scope):
+        self.client.incr(self.prefix + "version:" + scope)
+
+    def shared(self):
+        return True
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            if not key.startswith((self.prefix + "version:").encode()):
+                self.client.delete(key)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def load_backend(name=None):
+    """
+    Configured backend, falling back to memory if Redis is unavailable
+    """
+    name = name or config.RESPONSE_CACHE_BACKEND
+    if name == "memory":
+        return MemoryBackend(config.RESPONSE_CACHE_SIZE)
+    if name != "redis":
+        raise ValueError(f"Unknown response cache backend: {name}")
+
+    try:
+        backend = RedisBackend(config.RESPONSE_CACHE_REDIS_URL)
+        backend.client.ping()
+        return backend
+    except Exception as e:
+        print(f"⚠️  Redis response cache unavailable ({e}), using in-process cache")
+        return MemoryBackend(config.RESPONSE_CACHE_SIZE)
+
+
+# =========================
+# CACHE
+# =========================
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl_seconds=30, enabled=True):
+        self._backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    @property
+    def backend(self):
+        # Created on first use so importing services does not connect to Redis
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = load_backend()
+        return self._backend
+
+    def bump(self, scope="global"):
+        """
+        Invalidate every entry that depends on scope
+        """
+        self.backend.bump(scope)
+
+    def shared_across_workers(self):
+        """
+        Whether bumps in this process reach the other workers: always with
+        Redis, and for the memory backend when it was created before fork
+        """
+        return not self.enabled or self.backend.shared()
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            counts = self.counts.setdefault(endpoint, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get_or_compute(self, endpoint, args, compute, scopes=("global",)):
+        """
+        Cached result of compute() for endpoint(*args) at the current
+        versions of scopes
+        """
+        if not self.enabled:
+            return compute()
+
+        versions = [self.backend.version(scope) for scope in scopes]
+        key = f"{endpoint}:{json.dumps(args)}:{json.dumps(versions)}"
+
+        value = self.backend.get(key)
+        if value is not None:
+            self._count(endpoint, "hits")
+            return value
+
+        self._count(endpoint, "misses")
+        value = compute()
+        self.backend.set(key, value, self.ttl_seconds)
+        return value
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            endpoints = {name: dict(counts) for name, counts in self.counts.items()}
+
+        hits = sum(c["hits"] for c in endpoints.values())
+        lookups = hits + sum(c["misses"] for c in endpoints.values())
+        for counts in endpoints.values():
+            total = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = counts["hits"] / total if total else 0.0
+
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "endpoints": endpoints,
+            **(self.backend.stats() if self.enabled else {})
+        }
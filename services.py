@@ -0,0 +1,710 @@
+"""
+Request handling shared by the Flask app (app.py) and the ASGI app (asgi_app.py).
+
+Each function takes already-parsed request data, does the database and
+NLP work, and returns a JSON-serializable result. Invalid input and
+missing rows raise ServiceError with the HTTP status to send, so the two
+web layers only translate between their framework and these calls.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import string
+
+import config
+import metrics
+
+# Database
+from database import get_db
+from enrichment import enqueue, enrichment_pool, job_status
+from models import normalize_tags, set_question_tags
+from question_embeddings import question_store, to_blob
+from response_cache import ResponseCache
+from view_counts import view_counter
+
+# NLP logic
+from ann_index import top_k_desc
+from ranking import FEED_TAG_RELEVANCE, calculate_advanced_rank_score
+from model_utils import (
+    analyze_question,
+    analyze_questions,
+    process_new_question,
+    embedding_cache,
+    encode_query,
+    inference_scheduler
+)
+
+
+# Feed and similar-question results, invalidated by writes
+response_cache = ResponseCache(
+    ttl_seconds=config.RESPONSE_CACHE_TTL,
+    enabled=config.RESPONSE_CACHE_ENABLED
+)
+
+# Questions enriched in the background change the feeds like a new post
+enrichment_pool.on_ready = lambda question_id: response_cache.bump()
+
+
+def _runtime_metrics():
+    """
+    Cache, scheduler and enrichment counters for /metrics, read at scrape time
+    """
+    embedding = embedding_cache.stats()
+    response = response_cache.stats()
+    scheduler = inference_scheduler.stats()
+    views = view_counter.stats()
+
+    def per_cache(key):
+        samples = [({"cache": "embedding"}, embedding[key])]
+        if key in response:
+            samples.append(({"cache": "response"}, response[key]))
+        return samples
+
+    return [
+        ("qa_cache_hits_total", "counter", "Cache hits", per_cache("hits")),
+        ("qa_cache_misses_total", "counter", "Cache misses", per_cache("misses")),
+        ("qa_cache_evictions_total", "counter", "Entries evicted by the size bound", per_cache("evictions")),
+        ("qa_cache_entries", "gauge", "Entries currently cached", per_cache("size")),
+        ("qa_response_cache_hits_total", "counter", "Response cache hits per endpoint", [
+            ({"endpoint": name}, counts["hits"]) for name, counts in response["endpoints"].items()
+        ]),
+        ("qa_response_cache_misses_total", "counter", "Response cache misses per endpoint", [
+            ({"endpoint": name}, counts["misses"]) for name, counts in response["endpoints"].items()
+        ]),
+        ("qa_inference_batches_total", "counter", "Micro-batches run through SBERT", [({}, scheduler["batches"])]),
+        ("qa_inference_items_total", "counter", "Sentences encoded by the micro-batcher", [({}, scheduler["items"])]),
+        ("qa_inference_queue_depth", "gauge", "Sentences waiting for a micro-batch", [({}, scheduler["queue_depth"])]),
+        ("qa_enrichment_jobs_total", "counter", "Background enrichment outcomes in this process", [
+            ({"outcome": "completed"}, enrichment_pool.completed),
+            ({"outcome": "failed"}, enrichment_pool.failed),
+            ({"outcome": "retried"}, enrichment_pool.retried),
+        ]),
+        ("qa_view_count_flushes_total", "counter", "Batched view_count writes", [({}, views["flushes"])]),
+        ("qa_view_count_pending", "gauge", "Questions with views not yet written", [({}, views["pending_questions"])]),
+    ]
+
+
+metrics.register_collector(_runtime_metrics)
+
+
+class ServiceError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# =========================
+# UTILS
+# =========================
+def generate_anon_id():
+    return "Anon_" + "".join(
+        random.choices(string.ascii_uppercase + string.digits, k=5)
+    )
+
+
+def start_background_workers():
+    """
+    Per-process background work (view count flushes, enrichment pool in
+    async ask mode)
+    """
+    view_counter.start()
+    if config.ASK_MODE == "async":
+        enrichment_pool.start()
+
+
+# =========================
+# AUTH
+# =========================
+def signup(data):
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        raise ServiceError("Email and password required")
+
+    hashed = hashlib.sha256(password.encode()).hexdigest()
+    anon_id = generate_anon_id()
+
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO users (email, password, anon_id)
+            VALUES (?, ?, ?)
+        """, (email, hashed, anon_id))
+        db.commit()
+        user_id = cursor.lastrowid
+    except Exception:
+        db.close()
+        raise ServiceError("User already exists")
+
+    db.close()
+    return {
+        "message": "Signup successful",
+        "user_id": user_id,
+        "anon_id": anon_id
+    }
+
+
+def login(data):
+    email = data.get("email")
+    password = data.get("password")
+
+    hashed = hashlib.sha256(password.encode()).hexdigest()
+
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute("""
+        SELECT id, anon_id
+        FROM users
+        WHERE email = ? AND password = ?
+    """, (email, hashed))
+
+    user = cursor.fetchone()
+    db.close()
+
+    if not user:
+        raise ServiceError("Invalid credentials", 401)
+
+    return {
+        "message": "Login successful",
+        "user_id": user["id"],
+        "anon_id": user["anon_id"]
+    }
+
+
+# =========================
+# ANALYZE / SEARCH QUESTION
+# =========================
+def analyze(data):
+    question = data.get("question", "").strip()
+
+    if not question:
+        raise ServiceError("Question is required")
+
+    return analyze_question(question)
+
+
+def analyze_batch(data):
+    questions = data.get("questions")
+
+    if not isinstance(questions, list) or not questions:
+        raise ServiceError("A non-empty list of questions is required")
+
+    if len(questions) > config.MAX_BATCH_QUESTIONS:
+        raise ServiceError(f"At most {config.MAX_BATCH_QUESTIONS} questions per request")
+
+    if not all(isinstance(q, str) and q.strip() for q in questions):
+        raise ServiceError("Every question must be a non-empty string")
+
+    return {"results": analyze_questions([q.strip() for q in questions])}
+
+
+# =========================
+# ASK QUESTION
+# =========================
+def prepare_question(data):
+    """
+    Validation and NLP for a new question (the CPU-heavy half of ask_question)
+    """
+    question_text = data.get("question", "").strip()
+
+    if not question_text:
+        raise ServiceError("Question text is required")
+
+    return question_text, process_new_question(question_text)
+
+
+def store_question(question_text, user_id, nlp_result):
+    """
+    Insert a processed question (the SQLite half of ask_question)
+    """
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute("""
+        INSERT INTO questions (question_text, auto_tags, rank_score, cluster_id, user_id, embedding)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (
+        question_text,
+        ",".join(nlp_result["auto_tags"]),
+        nlp_result["rank_score"],
+        nlp_result["cluster_id"],
+        user_id,
+        to_blob(nlp_result["embedding"])
+    ))
+
+    question_id = cursor.lastrowid
+    set_question_tags(cursor, question_id, nlp_result["auto_tags"])
+    db.commit()
+    db.close()
+
+    question_store.add(question_id, nlp_result["embedding"])
+    response_cache.bump()
+
+    return {
+        "message": "Question posted successfully",
+        "question_id": question_id,
+        "auto_tags": nlp_result["auto_tags"],
+        "cluster_id": nlp_result["cluster_id"],
+        "similar_questions": nlp_result["similar_questions"]
+    }
+
+
+def ask_question(data):
+    if config.ASK_MODE == "async":
+        return accept_question(data)
+
+    question_text, nlp_result = prepare_question(data)
+    return store_question(question_text, data.get("user_id"), nlp_result)
+
+
+def accept_question(data):
+    """
+    Insert the question as pending and queue its enrichment; no NLP here
+    """
+    question_text = data.get("question", "").strip()
+
+    if not question_text:
+        raise ServiceError("Question text is required")
+
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute("""
+        INSERT INTO questions (question_text, user_id, status)
+        VALUES (?, ?, 'pending')
+    """, (question_text, data.get("user_id")))
+
+    question_id = cursor.lastrowid
+    enqueue(cursor, question_id)
+    db.commit()
+    db.close()
+
+    enrichment_pool.notify()
+    response_cache.bump()
+
+    return {
+        "message": "Question accepted",
+        "question_id": question_id,
+        "status": "pending",
+        "status_url": f"/questions/{question_id}/status"
+    }
+
+
+def question_status(question_id):
+    """
+    Enrichment state of a question, with its tags and similar questions once ready
+    """
+    db = get_db()
+    cursor = db.cursor()
+    row = job_status(cursor, question_id)
+    db.close()
+
+    if not row:
+        raise ServiceError("Question not found", 404)
+
+    result = json.loads(row["result"]) if row["result"] else {}
+    return {
+        "question_id": row["id"],
+        "status": row["status"],
+        "auto_tags": row["auto_tags"].split(",") if row["auto_tags"] else [],
+        "rank_score": row["rank_score"],
+        "cluster_id": row["cluster_id"],
+        "similar_questions": result.get("similar_questions"),
+        "attempts": row["attempts"],
+        "error": row["error"]
+    }
+
+
+# =========================
+# FEED PAGINATION (KEYSET)
+# =========================
+def encode_cursor(score, question_id):
+    raw = json.dumps([score, question_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(token):
+    try:
+        score, question_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return float(score), int(question_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def page_params(limit=None, cursor=None):
+    """
+    Raw ?limit= and ?cursor= values -> (limit, (score, id) or None)
+    """
+    try:
+        limit = int(limit) if limit is not None else config.FEED_PAGE_SIZE
+    except ValueError:
+        limit = config.FEED_PAGE_SIZE
+    limit = max(1, min(limit, config.FEED_MAX_PAGE_SIZE))
+
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise ServiceError(str(e))
+    return limit, after
+
+
+def next_page_headers(base_url, count, next_cursor):
+    """
+    The body stays a JSON array; the next page is advertised in headers
+    """
+    if not next_cursor:
+        return {}
+    return {
+        "X-Next-Cursor": next_cursor,
+        "Link": f'<{base_url}?limit={count}&cursor={next_cursor}>; rel="next"'
+    }
+
+
+def fetch_feed_page(cursor, after, limit, tag_relevance=FEED_TAG_RELEVANCE, tags=None,
+                    cluster_id=None):
+    """
+    One page of the ranked feed, ordered by (feed_score DESC, id DESC).
+    feed_score is materialized on the row and indexed, so a page is an
+    index range scan starting at the cursor. With tags, candidates come
+    from the question_tags index, so the cost follows the number of
+    matching questions. With cluster_id, the scan runs over
+    idx_questions_cluster instead.
+    Returns (rows, next_cursor).
+    """
+    sql = """
+        SELECT id, question_text, auto_tags, created_at, answer_count, view_count,
+               rank_score as base_score, feed_score
+        FROM questions
+    """
+    conditions = []
+    params = []
+    if tags:
+        conditions.append("""id IN (
+            SELECT question_id FROM question_tags
+            WHERE tag IN (SELECT value FROM json_each(?))
+        )""")
+        params.append(json.dumps(tags))
+    if cluster_id is not None:
+        conditions.append("cluster_id = ?")
+        params.append(cluster_id)
+    if after:
+        conditions.append("(feed_score, id) < (?, ?)")
+        params.extend(after)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY feed_score DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    cursor.execute(sql, params)
+    page = [dict(row) for row in cursor.fetchall()]
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1]["feed_score"], page[-1]["id"])
+
+    for q in page:
+        base_score = q.pop("base_score")
+        view_count = q.pop("view_count")
+        feed_score = q.pop("feed_score")
+        if tag_relevance == FEED_TAG_RELEVANCE:
+            q["rank_score"] = feed_score
+        else:
+            # Same ordering (tag relevance is a constant shift), different display score
+            q["rank_score"] = calculate_advanced_rank_score(
+                similarity_score=base_score or 0,
+                answer_count=q["answer_count"],
+                view_count=view_count,
+                tag_relevance=tag_relevance
+            )
+
+    return page, next_cursor
+
+
+# =========================
+# FEEDS
+# =========================
+def feed_page(limit, after):
+    """
+    Home feed ranked by the materialized feed score -> (questions, next_cursor)
+    """
+    return response_cache.get_or_compute(
+        "feed", [limit, after], lambda: _feed_page(limit, after)
+    )
+
+
+def _feed_page(limit, after):
+    db = get_db()
+    cursor = db.cursor()
+
+    page = fetch_feed_page(cursor, after, limit)
+
+    db.close()
+    return page
+
+
+def filtered_feed_page(user_id, limit, after):
+    """
+    Feed restricted to the user's preferred tags -> (questions, next_cursor)
+    """
+    return response_cache.get_or_compute(
+        "filtered_feed", [user_id, limit, after],
+        lambda: _filtered_feed_page(user_id, limit, after),
+        scopes=("global", f"user:{user_id}")
+    )
+
+
+def _filtered_feed_page(user_id, limit, after):
+    db = get_db()
+    cursor = db.cursor()
+
+    # Get user preferences
+    cursor.execute("""
+        SELECT tags FROM user_preferences WHERE user_id = ?
+    """, (user_id,))
+    pref_result = cursor.fetchone()
+
+    if not pref_result:
+        # No preferences set, return the general feed
+        page = fetch_feed_page(cursor, after, limit)
+        db.close()
+        return page
+
+    user_tags = normalize_tags(pref_result["tags"])
+
+    # Questions sharing any user tag, filtered and ranked in SQL
+    filtered, next_cursor = fetch_feed_page(
+        cursor, after, limit, tag_relevance=0.6, tags=user_tags
+    )
+
+    if not filtered and after is None:
+        # Nothing matches the user's tags: fall back to the general feed
+        filtered, next_cursor = fetch_feed_page(cursor, None, limit)
+        next_cursor = None
+
+    db.close()
+    return filtered, next_cursor
+
+
+def cluster_page(cluster_id, limit, after):
+    """
+    Questions of one cluster in feed order -> (questions, next_cursor)
+    """
+    return response_cache.get_or_compute(
+        "cluster", [cluster_id, limit, after], lambda: _cluster_page(cluster_id, limit, after)
+    )
+
+
+def _cluster_page(cluster_id, limit, after):
+    db = get_db()
+    cursor = db.cursor()
+
+    page = fetch_feed_page(cursor, after, limit, cluster_id=cluster_id)
+
+    db.close()
+    return page
+
+
+# =========================
+# ANSWERS
+# =========================
+def answer_question(data):
+    question_id = data.get("question_id")
+    answer_text = data.get("answer", "").strip()
+    user_id = data.get("user_id")
+
+    if not question_id or not answer_text:
+        raise ServiceError("Question ID and answer are required")
+
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute("""
+        INSERT INTO answers (question_id, answer_text, user_id)
+        VALUES (?, ?, ?)
+    """, (question_id, answer_text, user_id))
+
+    db.commit()
+    db.close()
+    response_cache.bump()
+
+    return {
+        "message": "Answer posted successfully"
+    }
+
+
+def question_detail(question_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute("""
+        SELECT id, question_text, auto_tags, cluster_id, rank_score, user_id, created_at,
+               answer_count, view_count, status
+        FROM questions WHERE id = ?
+    """, (question_id,))
+    question = cursor.fetchone()
+
+    if not question:
+        db.close()
+        raise ServiceError("Question not found", 404)
+
+    # Feeds the popularity part of feed_score (via trigger), written in batches
+    view_counter.add(question_id)
+
+    cursor.execute("""
+        SELECT answer_text, created_at, user_id
+        FROM answers
+        WHERE question_id = ?
+        ORDER BY created_at ASC
+    """, (question_id,))
+    answers = cursor.fetchall()
+
+    db.close()
+
+    return {
+        "question": dict(question),
+        "answers": [dict(a) for a in answers]
+    }
+
+
+# =========================
+# USER PREFERENCES
+# =========================
+def save_preferences(data):
+    user_id = data.get("user_id")
+    tags = data.get("tags", [])
+
+    if not user_id or not tags:
+        raise ServiceError("User ID and tags are required")
+
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO user_preferences (user_id, tags)
+            VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET tags = excluded.tags, updated_at = CURRENT_TIMESTAMP
+        """, (user_id, ",".join(tags)))
+        db.commit()
+    except Exception as e:
+        db.close()
+        raise ServiceError(str(e))
+
+    db.close()
+    response_cache.bump(f"user:{user_id}")
+    return {"message": "Preferences saved successfully"}
+
+
+def get_preferences(user_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute("""
+        SELECT tags FROM user_preferences WHERE user_id = ?
+    """, (user_id,))
+    result = cursor.fetchone()
+    db.close()
+
+    if result:
+        return {"tags": result["tags"].split(",")}
+    return {"tags": []}
+
+
+# =========================
+# SIMILAR QUESTIONS (CLUSTERING)
+# =========================
+def similar_questions(question_id):
+    """
+    Questions similar to the specified question,
+    used for clustering/related questions display
+    """
+    return response_cache.get_or_compute(
+        "similar", [question_id], lambda: _similar_questions(question_id)
+    )
+
+
+# Top questions by similarity that are re-ranked, and how many are returned
+SIMILAR_CANDIDATES = 50
+SIMILAR_RESULTS = 10
+
+
+def _similar_questions(question_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    # Get the target question
+    cursor.execute("""
+        SELECT id, question_text, auto_tags
+        FROM questions
+        WHERE id = ?
+    """, (question_id,))
+
+    target_q = cursor.fetchone()
+    if not target_q:
+        db.close()
+        raise ServiceError("Question not found", 404)
+
+    # Embeddings are stored at insert time; only encode if this row predates that
+    question_store.sync()
+    if question_store.get(question_id) is None:
+        embedding = encode_query(target_q["question_text"])
+        cursor.execute("""
+            UPDATE questions SET embedding = ? WHERE id = ?
+        """, (to_blob(embedding), question_id))
+        db.commit()
+        question_store.add(question_id, embedding)
+
+    # One matrix-vector product against every stored question
+    candidate_ids, scores = question_store.similarities(question_id)
+
+    # Only the most similar candidates (above 0.3) go to SQLite for
+    # re-ranking; argpartition keeps this O(n) in the number of questions
+    best = top_k_desc(scores, SIMILAR_CANDIDATES)
+    best = best[scores[best] > 0.3]
+    similarity_by_id = dict(zip(candidate_ids[best].tolist(), scores[best].tolist()))
+
+    cursor.execute("""
+        SELECT id, question_text, auto_tags, answer_count
+        FROM questions
+        WHERE id IN (SELECT value FROM json_each(?))
+    """, (json.dumps(list(similarity_by_id)),))
+
+    candidates = cursor.fetchall()
+    db.close()
+
+    similar = []
+    for q in candidates:
+        similarity = similarity_by_id[q["id"]]
+
+        # Re-rank with advanced scoring
+        final_score = calculate_advanced_rank_score(
+            similarity_score=similarity,
+            answer_count=q["answer_count"] or 0,
+            view_count=1,
+            tag_relevance=0.5
+        )
+
+        similar.append({
+            "id": q["id"],
+            "question": q["question_text"],
+            "tags": q["auto_tags"],
+            "similarity": similarity,
+            "rank_score": final_score,
+            "answer_count": q["answer_count"] or 0
+        })
+
+    # Sort by final score
+    similar.sort(key=lambda x: x["rank_score"], reverse=True)
+
+    return {
+        "original_question": target_q["question_text"],
+        "similar_questions": similar[:SIMILAR_RESULTS]
+    }
@@ -0,0 +1,224 @@
+"""
+Embedding-based tag assignment (see notebooks/auto_tag_generation.ipynb).
+
+The Stack Overflow tag vocabulary is embedded once and persisted. A
+question is then tagged by comparing its already computed SBERT
+embedding against the tag embeddings, with no per-request KeyBERT
+candidate extraction.
+
+    python tag_engine.py build
+    python tag_engine.py benchmark --samples 200
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+import config
+from corpus_embeddings import normalize_rows
+
+
+# =========================
+# ENGINE
+# =========================
+
+class VocabTagEngine:
+    """
+    Nearest tags to a question embedding from a fixed, pre-embedded vocabulary
+    """
+
+    def __init__(self, vocab, tag_embeddings):
+        self.vocab = vocab
+        self.tag_embeddings = normalize_rows(tag_embeddings)
+
+    def __len__(self):
+        return len(self.vocab)
+
+    @staticmethod
+    def paths(tag_dir=None):
+        tag_dir = tag_dir or config.TAG_ENGINE_DIR
+        return (
+            os.path.join(tag_dir, "tag_vocab.json"),
+            os.path.join(tag_dir, "tag_embeddings.npy")
+        )
+
+    @staticmethod
+    def exists(tag_dir=None):
+        return all(os.path.exists(p) for p in VocabTagEngine.paths(tag_dir))
+
+    @classmethod
+    def load(cls, tag_dir=None):
+        vocab_path, embeddings_path = cls.paths(tag_dir)
+        with open(vocab_path) as f:
+            vocab = json.load(f)
+        return cls(vocab, np.load(embeddings_path))
+
+    def save(self, tag_dir=None):
+        vocab_path, embeddings_path = self.paths(tag_dir)
+        os.makedirs(os.path.dirname(vocab_path), exist_ok=True)
+        with open(vocab_path, "w") as f:
+            json.dump(self.vocab, f)
+        np.save(embeddings_path, self.tag_embeddings)
+
+    def tags_for_batch(self, embeddings, top_n=5, min_score=None):
+        """
+        [(tag, score), ...] per embedding, best first, above min_score
+        """
+        min_score = config.TAG_MIN_SCORE if min_score is None else min_score
+        queries = normalize_rows(np.atleast_2d(embeddings))
+        if len(self.vocab) == 0:
+            return [[] for _ in queries]
+        scores = queries @ self.tag_embeddings.T
+
+        top_n = min(top_n, len(self.vocab))
+        best = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+
+        results = []
+        for row, candidates in zip(scores, best):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([
+                (self.vocab[i], float(row[i]))
+                for i in ranked if row[i] >= min_score
+            ])
+        return results
+
+    def tags_for(self, embedding, top_n=5, min_score=None):
+        return self.tags_for_batch(embedding, top_n, min_score)[0]
+
+
+# =========================
+# BUILD
+# =========================
+
+def tag_vocabulary(corpus, min_count=None):
+    """
+    Lower-cased corpus tags used at least min_count times, counted in one
+    pass over the payload tag ids (see corpus_store.CorpusPayloads)
+    """
+    min_count = config.TAG_MIN_COUNT if min_count is None else min_count
+    payloads = corpus.payloads
+    uses = np.bincount(np.asarray(payloads.tag_ids), minlength=len(payloads.tag_vocab))
+
+    counts = Counter()
+    for tag, n in zip(payloads.tag_vocab, uses.tolist()):
+        counts[tag.lower()] += n
+    return sorted(tag for tag, n in counts.items() if n >= min_count)
+
+
+def build_engine(tag_dir=None):
+    from model_utils import get_corpus, get_sbert_model
+
+    vocab = tag_vocabulary(get_corpus())
+    if not vocab:
+        raise SystemExit(
+            f"⚠️  No corpus tag is used {config.TAG_MIN_COUNT} times or more, "
+            f"nothing to build (lower QA_TAG_MIN_COUNT)"
+        )
+    print(f"🚀 Embedding {len(vocab)} tags...")
+
+    start = time.perf_counter()
+    tag_embeddings = get_sbert_model().encode(
+        vocab,
+        batch_size=config.ENCODE_BATCH_SIZE,
+        show_progress_bar=True
+    )
+    engine = VocabTagEngine(vocab, tag_embeddings)
+    engine.save(tag_dir)
+    print(f"✅ Saved to {tag_dir or config.TAG_ENGINE_DIR} in {time.perf_counter() - start:.1f}s")
+
+
+# =========================
+# BENCHMARK
+# =========================
+
+def overlap(a, b):
+    """
+    Jaccard overlap of two tag lists
+    """
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def recall_of(true_tags, predicted):
+    """
+    Fraction of the original Stack Overflow tags recovered (notebook metric)
+    """
+    true_tags = set(t.lower() for t in true_tags)
+    return len(true_tags & set(predicted)) / max(len(true_tags), 1)
+
+
+def benchmark(samples=200, top_n=8):
+    """
+    Latency and tag agreement of the vocab engine vs the KeyBERT path
+    on a random sample of corpus questions
+    """
+    import model_utils
+
+    corpus = model_utils.get_corpus()
+    engine = model_utils.get_tag_engine(force=True)
+    rng = np.random.default_rng(42)
+    rows = rng.choice(len(corpus), min(samples, len(corpus)), replace=False)
+
+    texts = [corpus.row(int(i))["Processed_Text"] for i in rows]
+    true_tags = [model_utils.parse_tags(corpus.row(int(i))["Tags_List"]) for i in rows]
+    embeddings = model_utils.get_sbert_model().encode(texts, batch_size=config.ENCODE_BATCH_SIZE)
+
+    # Warm both paths before timing
+    model_utils.extract_keywords_improved(texts[0], top_n=top_n, engine="keybert")
+    engine.tags_for(embeddings[0], top_n=top_n)
+
+    keybert_tags, keybert_times = [], []
+    vocab_tags, vocab_times = [], []
+    for text, embedding in zip(texts, embeddings):
+        start = time.perf_counter()
+        keybert_tags.append(model_utils.extract_keywords_improved(text, top_n=top_n, engine="keybert"))
+        keybert_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        vocab_tags.append(model_utils.extract_keywords_improved(
+            text, top_n=top_n, embedding=embedding, engine="vocab"
+        ))
+        vocab_times.append(time.perf_counter() - start)
+
+    def ms(times, q):
+        return round(float(np.percentile(times, q)) * 1000, 3)
+
+    report = {
+        "samples": len(texts),
+        "keybert_ms": {"p50": ms(keybert_times, 50), "p95": ms(keybert_times, 95)},
+        "vocab_ms": {"p50": ms(vocab_times, 50), "p95": ms(vocab_times, 95)},
+        "overlap_vocab_vs_keybert": float(np.mean([
+            overlap(a, b) for a, b in zip(vocab_tags, keybert_tags)
+        ])),
+        "recall_of_original_tags": {
+            "keybert": float(np.mean([recall_of(t, p) for t, p in zip(true_tags, keybert_tags)])),
+            "vocab": float(np.mean([recall_of(t, p) for t, p in zip(true_tags, vocab_tags)]))
+        }
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding-based tag engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Embed the corpus tag vocabulary")
+    build.add_argument("--out", default=config.TAG_ENGINE_DIR)
+
+    bench = sub.add_parser("benchmark", help="Compare latency and tags with KeyBERT")
+    bench.add_argument("--samples", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_engine(args.out)
+    else:
+        benchmark(samples=args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Rule-based tagging with one compiled regex.
+
+A tag dictionary maps a category to its synonyms:
+    {"python": ["python", "py", "django"], ...}
+
+All synonyms are folded into a single prefix-trie regex, so the text is
+scanned once and the work per position depends on the length of the
+matched synonym rather than on the dictionary size. Matches must sit on
+token boundaries: "py" does not match inside "happy", nor "ml" inside "html".
+"""
+
+import json
+import re
+
+# Characters that may not touch either end of a match
+TOKEN_CHARS = r"a-z0-9_"
+
+
+def load_tag_dictionary(path):
+    """
+    {category: [synonyms]} from a JSON file
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _trie_pattern(words):
+    """
+    Regex source matching any of words, factored by common prefixes.
+    Longer alternatives are tried first, shorter ones on backtrack.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            if len(branches) == 1:
+                body = "(?:" + body + ")"
+            return body + "?"
+        return body
+
+    return build(trie)
+
+
+class TagMatcher:
+    def __init__(self, dictionary):
+        self.categories = list(dictionary)
+        self._categories_of = {}
+
+        for position, (category, synonyms) in enumerate(dictionary.items()):
+            for synonym in synonyms:
+                key = _normalize(synonym)
+                if key:
+                    self._categories_of.setdefault(key, []).append(position)
+
+        if self._categories_of:
+            self._regex = re.compile(
+                f"(?<![{TOKEN_CHARS}])(?:{_trie_pattern(self._categories_of)})(?![{TOKEN_CHARS}])"
+            )
+        else:
+            self._regex = None
+
+    def __len__(self):
+        return len(self._categories_of)
+
+    def match(self, text):
+        """
+        Categories whose synonyms appear in text, in dictionary order
+        """
+        if self._regex is None:
+            return []
+
+        found = set()
+        for m in self._regex.finditer(_normalize(text)):
+            found.update(self._categories_of[m.group(0)])
+        return [self.categories[i] for i in sorted(found)]
@@ -0,0 +1,112 @@
+"""
+Buffered question view counts.
+
+GET /questions/<id> used to run UPDATE view_count = view_count + 1 and a
+commit on every request, so the busiest read path took SQLite's write
+lock. Views are now added to an in-memory buffer and written back by a
+background thread every VIEW_FLUSH_SECONDS (sooner once VIEW_FLUSH_PENDING
+questions are waiting), as one transaction with one UPDATE per question.
+
+view_count and the feed_score derived from it lag by at most one flush
+interval. Buffers are per process; views still pending when a process
+exits are flushed at exit, a crash loses them.
+"""
+
+import atexit
+import os
+import threading
+
+import config
+from database import get_db
+
+
+class ViewCounter:
+    """
+    question id -> views not yet written. start() is idempotent and per
+    process, like EnrichmentPool: the flush thread does not survive a fork.
+    """
+
+    def __init__(self, flush_seconds=5.0, max_pending=1000):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self.flushes = 0
+        self.flushed_views = 0
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.flush)
+            # Views buffered by the parent are the parent's to write
+            self._pid = os.getpid()
+            self._pending = {}
+            self._wake = threading.Event()
+            threading.Thread(target=self._run, name="view-counts", daemon=True).start()
+
+    def add(self, question_id):
+        self.start()
+        with self._lock:
+            self._pending[question_id] = self._pending.get(question_id, 0) + 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  View count flush error: {e}")
+
+    def flush(self):
+        """
+        Write the buffered views; returns the number of questions updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            db = get_db()
+            try:
+                db.cursor().executemany("""
+                    UPDATE questions SET view_count = view_count + ? WHERE id = ?
+                """, [(views, question_id) for question_id, views in sorted(pending.items())])
+                db.commit()
+            except Exception:
+                # Put the views back for the next flush
+                with self._lock:
+                    for question_id, views in pending.items():
+                        self._pending[question_id] = self._pending.get(question_id, 0) + views
+                raise
+            finally:
+                db.close()
+
+            self.flushes += 1
+            self.flushed_views += sum(pending.values())
+            return len(pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending_questions": len(self._pending),
+                "flushes": self.flushes,
+                "flushed_views": self.flushed_views
+            }
+
+
+view_counter = ViewCounter(
+    flush_seconds=config.VIEW_FLUSH_SECONDS,
+    max_pending=config.VIEW_FLUSH_PENDING
+)